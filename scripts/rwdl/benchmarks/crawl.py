@@ -0,0 +1,205 @@
+################################################
+# RWDL - crawl benchmark
+# Copyright (c) 2025 angeldev0
+# License: MIT
+################################################
+"""
+End-to-end crawl benchmark against the local synthetic directory server
+(benchmarks/synthetic_server.py), so it runs offline and is repeatable.
+
+Every variant runs rwdl.py as a child process into a fresh output directory
+and reports files/s, MB/s, peak RSS and the requests the server saw. The
+listing parser is timed separately on one large generated listing per
+format, next to the BeautifulSoup baseline.
+
+    python benchmarks/crawl.py --depth 3 --fanout 4 --files 30 --latency 0.02 \\
+        --variant "serial=-w 1" --variant "parallel=-w 8 --per-host 8"
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import shlex
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, '..'))
+import synthetic_server
+import rwdl
+from bs4 import BeautifulSoup
+
+RWDL = os.path.join(HERE, '..', 'rwdl.py')
+DEFAULT_VARIANTS = ['serial=-w 1', 'parallel=-w 8 --per-host 8']
+BASE_ARGS = ['--delay', '0', '--max-rate', '10000']
+
+SERVER_START_TIMEOUT = 30.0
+
+def serve(port, options, status):
+    """Server process entry point; puts None on status once listening, else the error"""
+    try:
+        tree = synthetic_server.Tree(options['depth'], options['fanout'], options['files'],
+                                     options['sizes'], seed=options['seed'])
+        server, _ = synthetic_server.create_server(port, tree, options['format'],
+                                                   options['latency'], options['throttle'])
+    except Exception as e:
+        status.put(f"cannot serve on port {port}: {e}")
+        return
+    status.put(None)
+    server.serve_forever()
+
+def wait_for_server(server, status, timeout=SERVER_START_TIMEOUT):
+    """None once the server process listens, or why it did not come up"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            return status.get(timeout=0.2)
+        except queue.Empty:
+            if not server.is_alive():
+                return f"server process exited with code {server.exitcode}"
+    return f"server did not start within {timeout:g}s"
+
+def server_call(port, path):
+    with urllib.request.urlopen(f'http://127.0.0.1:{port}{path}') as response:
+        return json.load(response)
+
+def directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            if not name.startswith('.rwdl-state'):
+                total += os.path.getsize(os.path.join(root, name))
+    return total
+
+def run_variant(port, depth, extra_args, quiet):
+    """Run one rwdl crawl; returns wall time, peak RSS and output stats"""
+    server_call(port, '/__reset')
+    with tempfile.TemporaryDirectory(prefix='rwdl-bench-') as output:
+        command = [sys.executable, RWDL, '-u', f'http://127.0.0.1:{port}/', '-e', '.bin',
+                   '-d', str(depth), '-o', output] + BASE_ARGS + extra_args
+        start = time.perf_counter()
+        child = subprocess.Popen(command, stdout=subprocess.DEVNULL if quiet else None)
+        _, status, usage = os.wait4(child.pid, 0)
+        child.returncode = os.waitstatus_to_exitcode(status)
+        elapsed = time.perf_counter() - start
+        files = sum(len([n for n in names if not n.startswith('.rwdl-state')])
+                    for _, _, names in os.walk(output))
+        size = directory_size(output)
+    return {
+        'exit': child.returncode,
+        'seconds': elapsed,
+        'files': files,
+        'bytes': size,
+        'cpu': usage.ru_utime + usage.ru_stime,
+        'peak_rss_mb': usage.ru_maxrss / 1024,   # KiB on Linux
+        'requests': server_call(port, '/__stats'),
+    }
+
+def make_listing(fmt, entries):
+    """One large listing page in the given format"""
+    rows = [(f'file-{i:06d}.bin', False, 1000 + i * 37, synthetic_server.EPOCH - i * 60)
+            for i in range(entries)]
+    body, _ = synthetic_server.render_listing('/big/', rows, fmt)
+    return body
+
+def time_parser(fmt, body, repeat):
+    """Best-of-repeat seconds for rwdl's listing parser and for BeautifulSoup"""
+    content_type = 'application/json' if fmt == 'json' else 'text/html'
+
+    def listing():
+        return rwdl.parse_listing(body, content_type)
+
+    def soup():
+        if fmt == 'json':
+            return [e['name'] for e in json.loads(body)]
+        return [a['href'] for a in BeautifulSoup(body, 'html.parser').select('a[href]')
+                if rwdl.is_listing_link(a['href'])]
+
+    results = {}
+    for name, func in (('rwdl', listing), ('baseline', soup)):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            count = len(func())
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = (best, count)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark rwdl against a synthetic server')
+    synthetic_server.add_tree_arguments(parser)
+    parser.add_argument('--port', type=int, default=8801, help='Server port (default: 8801)')
+    parser.add_argument('--variant', action='append',
+                        help='NAME=RWDL_ARGS to benchmark; repeatable '
+                             f'(default: {" / ".join(DEFAULT_VARIANTS)})')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per variant (default: 1)')
+    parser.add_argument('--listing-entries', type=int, default=20000,
+                        help='Entries in the listing parse benchmark (default: 20000)')
+    parser.add_argument('--skip-crawl', action='store_true', help='Only time the listing parser')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    parser.add_argument('--verbose', action='store_true', help="Show rwdl's own output")
+    args = parser.parse_args()
+
+    report = {'tree': {}, 'crawl': {}, 'listing': {}}
+    if not args.skip_crawl:
+        tree = synthetic_server.Tree(args.depth, args.fanout, args.files, args.sizes, seed=args.seed)
+        dirs, files, total = tree.totals()
+        report['tree'] = {'directories': dirs, 'files': files, 'bytes': total}
+        print(f"Tree: {dirs} directories, {files} files, {total / 1e6:.1f} MB "
+              f"({args.format} listings, latency {args.latency * 1000:g} ms, "
+              f"throttle {args.throttle or 'off'})")
+
+        options = {'depth': args.depth, 'fanout': args.fanout, 'files': args.files,
+                   'sizes': args.sizes, 'seed': args.seed, 'format': args.format,
+                   'latency': args.latency, 'throttle': args.throttle}
+        status = multiprocessing.Queue()
+        server = multiprocessing.Process(target=serve, args=(args.port, options, status), daemon=True)
+        server.start()
+        error = wait_for_server(server, status)
+        if error:
+            server.terminate()
+            sys.exit(f"Synthetic server failed: {error}")
+        try:
+            print(f"{'variant':<16} {'files/s':>9} {'MB/s':>9} {'wall s':>8} {'cpu s':>7} "
+                  f"{'peak RSS':>9} {'requests':>9} {'429s':>6}")
+            for variant in args.variant or DEFAULT_VARIANTS:
+                name, _, extra = variant.partition('=')
+                runs = []
+                for _ in range(args.repeat):
+                    result = run_variant(args.port, args.depth, shlex.split(extra), not args.verbose)
+                    runs.append(result)
+                    if result['exit'] != 0 or result['files'] != files:
+                        print(f"  ! {name}: exit {result['exit']}, {result['files']}/{files} files")
+                best = min(runs, key=lambda r: r['seconds'])
+                report['crawl'][name] = {'args': extra, 'runs': runs}
+                requests_seen = best['requests']
+                print(f"{name:<16} {best['files'] / best['seconds']:>9.1f} "
+                      f"{best['bytes'] / 1e6 / best['seconds']:>9.1f} {best['seconds']:>8.2f} "
+                      f"{best['cpu']:>7.2f} {best['peak_rss_mb']:>7.1f}MB "
+                      f"{requests_seen.get('requests', 0):>9} {requests_seen.get('throttled', 0):>6}")
+        finally:
+            server.terminate()
+            server.join()
+
+    print(f"\nListing parse, {args.listing_entries} entries (best of 3):")
+    print(f"{'format':<8} {'rwdl ms':>13} {'baseline ms':>12} {'entries':>8}")
+    for fmt in ('apache', 'nginx', 'json'):
+        body = make_listing(fmt, args.listing_entries)
+        timings = time_parser(fmt, body, 3)
+        report['listing'][fmt] = {name: seconds for name, (seconds, _) in timings.items()}
+        print(f"{fmt:<8} {timings['rwdl'][0] * 1000:>13.1f} "
+              f"{timings['baseline'][0] * 1000:>12.1f} {timings['rwdl'][1]:>8}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
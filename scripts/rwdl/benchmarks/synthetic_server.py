@@ -0,0 +1,384 @@
+################################################
+# RWDL - synthetic directory server for benchmarks
+# Copyright (c) 2025 angeldev0
+# License: MIT
+################################################
+"""
+Local HTTP server that serves a generated directory tree as autoindex
+listings, so rwdl can be benchmarked offline.
+
+The tree is described by depth, fan-out and files per directory; file sizes
+come from a seeded distribution and file contents are generated on the fly,
+so nothing is written to disk. The server supports keep-alive, HEAD, Range,
+ETag/Last-Modified validators (304), injected latency and a throttle that
+answers 429 with Retry-After once a request rate is exceeded.
+
+Request counters are available as JSON at /__stats.
+
+    python benchmarks/synthetic_server.py --depth 3 --fanout 4 --files 20 --format nginx
+"""
+
+import re
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import quote, unquote, urlsplit
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+BLOCK = random.Random(0).getrandbits(8 * 1024 * 1024).to_bytes(1024 * 1024, 'little')
+EPOCH = 1700000000      # fixed "last modified" base so validators are stable
+
+def stable_hash(text):
+    """Process independent hash, so validators survive a server restart"""
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), 'big')
+
+def parse_size(text):
+    """'512', '64K', '1.5M', '2G' -> bytes"""
+    m = re.fullmatch(r'(\d+(?:\.\d+)?)([KMG]?)', text.strip().upper())
+    if not m:
+        raise argparse.ArgumentTypeError(f"Bad size: {text!r}")
+    return int(float(m.group(1)) * {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}[m.group(2)])
+
+def parse_distribution(text):
+    """
+    File size distribution:
+      fixed:SIZE            every file has SIZE bytes
+      uniform:MIN-MAX       uniformly distributed sizes
+      lognormal:MEDIAN      heavy tailed sizes around MEDIAN (sigma 1.5)
+    """
+    kind, _, spec = text.partition(':')
+    try:
+        if kind == 'fixed':
+            size = parse_size(spec)
+            return lambda rng: size
+        if kind == 'uniform':
+            low, high = (parse_size(part) for part in spec.split('-'))
+            return lambda rng: rng.randint(low, high)
+        if kind == 'lognormal':
+            median = parse_size(spec)
+            return lambda rng: max(1, int(rng.lognormvariate(0, 1.5) * median))
+    except (ValueError, argparse.ArgumentTypeError):
+        pass
+    raise argparse.ArgumentTypeError(f"Bad size distribution: {text!r}")
+
+def distribution_arg(text):
+    """argparse type: validate a distribution but keep its text form"""
+    parse_distribution(text)
+    return text
+
+class Tree:
+    """A generated directory tree; nodes are computed on demand from the seed"""
+    def __init__(self, depth, fanout, files, sizes='lognormal:32K', extension='.bin', seed=1):
+        self.depth = depth
+        self.fanout = fanout
+        self.files = files
+        self.sizes = parse_distribution(sizes)
+        self.extension = extension
+        self.seed = seed
+
+    def _rng(self, path):
+        return random.Random(stable_hash(f'{self.seed}:{path}'))
+
+    def lookup(self, path):
+        """Return ('dir', level) or ('file', size, mtime) for a path, or None"""
+        parts = [p for p in path.split('/') if p]
+        if path.endswith('/') or not parts:
+            if len(parts) > self.depth:
+                return None
+            for part in parts:
+                if not re.fullmatch(r'd\d+', part) or int(part[1:]) >= self.fanout:
+                    return None
+            return ('dir', len(parts))
+        *dirs, name = parts
+        if len(dirs) > self.depth or not all(
+                re.fullmatch(r'd\d+', d) and int(d[1:]) < self.fanout for d in dirs):
+            return None
+        m = re.fullmatch(rf'f(\d+){re.escape(self.extension)}', name)
+        if not m or int(m.group(1)) >= self.files:
+            return None
+        rng = self._rng(path)
+        return ('file', self.sizes(rng), EPOCH - rng.randint(0, 365 * 86400))
+
+    def children(self, path, level):
+        """Entries of a directory as (name, is_dir, size, mtime)"""
+        entries = []
+        if level < self.depth:
+            for i in range(self.fanout):
+                entries.append((f'd{i}/', True, None, EPOCH))
+        for i in range(self.files):
+            name = f'f{i}{self.extension}'
+            _, size, mtime = self.lookup(path + name)
+            entries.append((name, False, size, mtime))
+        return entries
+
+    def totals(self):
+        """(directories, files, bytes) of the whole tree"""
+        dirs = sum(self.fanout ** level for level in range(self.depth + 1))
+        total_bytes = 0
+        count = 0
+        def walk(path, level):
+            nonlocal total_bytes, count
+            for name, is_dir, size, _ in self.children(path, level):
+                if is_dir:
+                    walk(path + name, level + 1)
+                else:
+                    count += 1
+                    total_bytes += size
+        walk('/', 0)
+        return dirs, count, total_bytes
+
+def render_listing(path, entries, fmt):
+    """Render an autoindex page in the given server's style"""
+    if fmt == 'json':
+        items = []
+        for name, is_dir, size, mtime in entries:
+            item = {'name': name.rstrip('/'), 'type': 'directory' if is_dir else 'file',
+                    'mtime': formatdate(mtime, usegmt=True)}
+            if not is_dir:
+                item['size'] = size
+            items.append(item)
+        return json.dumps(items), 'application/json'
+    if fmt == 'apache':
+        rows = ['<tr><th valign="top"><img src="/icons/blank.gif" alt="[ICO]"></th>'
+                '<th><a href="?C=N;O=D">Name</a></th><th><a href="?C=M;O=A">Last modified</a></th>'
+                '<th><a href="?C=S;O=A">Size</a></th></tr>',
+                '<tr><td valign="top"><img src="/icons/back.gif" alt="[PARENTDIR]"></td>'
+                '<td><a href="../">Parent Directory</a></td><td>&nbsp;</td><td align="right">  - </td></tr>']
+        for name, is_dir, size, mtime in entries:
+            stamp = time.strftime('%Y-%m-%d %H:%M', time.gmtime(mtime))
+            shown = '-' if is_dir else human_size(size)
+            rows.append(f'<tr><td valign="top"><img src="/icons/unknown.gif" alt="[   ]"></td>'
+                        f'<td><a href="{quote(name)}">{name}</a></td>'
+                        f'<td align="right">{stamp}  </td><td align="right">{shown}</td></tr>')
+        body = (f'<!DOCTYPE HTML PUBLIC "-//W3C//DTD HTML 3.2 Final//EN">\n<html>\n<head>\n'
+                f'<title>Index of {path}</title>\n</head>\n<body>\n<h1>Index of {path}</h1>\n'
+                '<table>\n' + '\n'.join(rows) + '\n</table>\n</body></html>\n')
+        return body, 'text/html;charset=UTF-8'
+    # nginx
+    lines = ['<a href="../">../</a>']
+    for name, is_dir, size, mtime in entries:
+        stamp = time.strftime('%d-%b-%Y %H:%M', time.gmtime(mtime))
+        lines.append(f'<a href="{quote(name)}">{name}</a>{" " * max(1, 51 - len(name))}'
+                     f'{stamp} {"-" if is_dir else size:>19}')
+    body = (f'<html>\n<head><title>Index of {path}</title></head>\n<body>\n'
+            f'<h1>Index of {path}</h1><hr><pre>' + '\n'.join(lines) + '\n</pre><hr></body>\n</html>\n')
+    return body, 'text/html'
+
+def human_size(size):
+    """Apache style rounded size (1.2M)"""
+    for unit in ('', 'K', 'M', 'G'):
+        if size < 1024 or unit == 'G':
+            return f'{size}' if not unit else f'{size:.1f}{unit}'
+        size /= 1024
+    return str(size)
+
+class Stats:
+    """Thread-safe request counters"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {}
+
+    def add(self, key, amount=1):
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+    def reset(self):
+        with self._lock:
+            self.counts.clear()
+
+class Throttle:
+    """Global request rate cap; returns False when a request should get a 429"""
+    def __init__(self, rate):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self.tokens = rate
+        self.stamp = time.monotonic()
+
+    def allow(self):
+        if not self.rate:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+def make_handler(tree, fmt, latency, throttle, stats):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body go out in separate writes; with Nagle on, a
+        # keep-alive client's delayed ACK stalls every response by ~40 ms
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def do_HEAD(self):
+            self.respond(head=True)
+
+        def do_GET(self):
+            self.respond(head=False)
+
+        def send_body(self, status, body, content_type, headers=(), head=False):
+            data = body.encode() if isinstance(body, str) else body
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            if not head:
+                self.wfile.write(data)
+
+        def respond(self, head):
+            path = unquote(urlsplit(self.path).path)
+            if path == '/__stats':
+                self.send_body(200, json.dumps(stats.snapshot()), 'application/json', head=head)
+                return
+            if path == '/__reset':
+                stats.reset()
+                self.send_body(200, '{}', 'application/json', head=head)
+                return
+            stats.add('requests')
+            stats.add('head' if head else 'get')
+            if latency:
+                time.sleep(latency)
+            if not throttle.allow():
+                stats.add('throttled')
+                self.send_body(429, 'slow down', 'text/plain', [('Retry-After', '1')], head)
+                return
+            node = tree.lookup(path)
+            if node is None:
+                stats.add('not_found')
+                self.send_body(404, 'not found', 'text/plain', head=head)
+                return
+            if node[0] == 'dir':
+                self.serve_listing(path, node[1], head)
+            else:
+                self.serve_file(path, node[1], node[2], head)
+
+        def not_modified(self, etag, mtime):
+            match = self.headers.get('If-None-Match')
+            if match is not None:
+                return match == etag
+            since = self.headers.get('If-Modified-Since')
+            if since:
+                try:
+                    return parsedate_to_datetime(since).timestamp() >= int(mtime)
+                except (TypeError, ValueError):
+                    return False
+            return False
+
+        def serve_listing(self, path, level, head):
+            stats.add('listings')
+            etag = f'"d-{tree.seed}-{stable_hash(path) % 10 ** 8}"'
+            validators = [('ETag', etag), ('Last-Modified', formatdate(EPOCH, usegmt=True))]
+            if self.not_modified(etag, EPOCH):
+                stats.add('not_modified')
+                self.send_response(304)
+                for name, value in validators:
+                    self.send_header(name, value)
+                self.end_headers()
+                return
+            body, content_type = render_listing(path, tree.children(path, level), fmt)
+            self.send_body(200, body, content_type, validators, head)
+
+        def serve_file(self, path, size, mtime, head):
+            etag = f'"f-{tree.seed}-{size}-{mtime}"'
+            headers = [('ETag', etag), ('Last-Modified', formatdate(mtime, usegmt=True)),
+                       ('Accept-Ranges', 'bytes')]
+            if self.not_modified(etag, mtime):
+                stats.add('not_modified')
+                self.send_response(304)
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                return
+            start, end, status = 0, size - 1, 200
+            rng = self.headers.get('Range')
+            if_range = self.headers.get('If-Range')
+            if rng and (if_range is None or if_range == etag):
+                m = re.fullmatch(r'bytes=(\d+)-(\d*)', rng.strip())
+                if m:
+                    start = int(m.group(1))
+                    end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+                    if start >= size:
+                        self.send_response(416)
+                        self.send_header('Content-Range', f'bytes */{size}')
+                        self.send_header('Content-Length', '0')
+                        self.end_headers()
+                        return
+                    status = 206
+                    headers.append(('Content-Range', f'bytes {start}-{end}/{size}'))
+                    stats.add('ranges')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(end - start + 1))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            if head:
+                return
+            stats.add('files')
+            # Content: the shared block, rotated by a per-file offset
+            offset = (start + (stable_hash(path) % len(BLOCK))) % len(BLOCK)
+            left = end - start + 1
+            stats.add('bytes', left)
+            while left:
+                n = min(left, len(BLOCK) - offset)
+                self.wfile.write(BLOCK[offset:offset + n])
+                left -= n
+                offset = 0
+    return Handler
+
+def create_server(port, tree, fmt='nginx', latency=0.0, throttle=0.0):
+    """Build (but do not start) a server; returns (server, stats)"""
+    stats = Stats()
+    handler = make_handler(tree, fmt, latency, Throttle(throttle), stats)
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    return server, stats
+
+def add_tree_arguments(parser):
+    """Options describing the generated tree and server behaviour"""
+    parser.add_argument('--depth', type=int, default=2, help='Directory levels below the root (default: 2)')
+    parser.add_argument('--fanout', type=int, default=4, help='Subdirectories per directory (default: 4)')
+    parser.add_argument('--files', type=int, default=20, help='Files per directory (default: 20)')
+    parser.add_argument('--sizes', type=distribution_arg, default='lognormal:32K',
+                        help='fixed:SIZE, uniform:MIN-MAX or lognormal:MEDIAN (default: lognormal:32K)')
+    parser.add_argument('--format', choices=['nginx', 'apache', 'json'], default='nginx',
+                        help='Listing style (default: nginx)')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Seconds added to every request (default: 0)')
+    parser.add_argument('--throttle', type=float, default=0.0,
+                        help='Answer 429 above this many requests/s (default: off)')
+    parser.add_argument('--seed', type=int, default=1, help='Tree seed (default: 1)')
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a synthetic autoindex tree')
+    parser.add_argument('--port', type=int, default=8800, help='Port (default: 8800)')
+    add_tree_arguments(parser)
+    args = parser.parse_args()
+    tree = Tree(args.depth, args.fanout, args.files, args.sizes, seed=args.seed)
+    dirs, files, size = tree.totals()
+    server, _ = create_server(args.port, tree, args.format, args.latency, args.throttle)
+    print(f"Serving {dirs} directories, {files} files ({size / 1e6:.1f} MB) "
+          f"on http://127.0.0.1:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+################################################
+# RWDL - write path micro-benchmark
+# Copyright (c) 2025 angeldev0
+# License: MIT
+################################################
+"""
+Compare the old download loop (iter_content(8192) into a buffered file)
+with rwdl's copy_stream() write path (reusable buffer, adaptive chunk size,
+unbuffered writes, preallocation).
+
+The file is served from memory by a local HTTP server running in a separate
+process, so the CPU time reported is the client's alone.
+
+    python benchmarks/write_path.py --size 1G --repeat 3
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import multiprocessing
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import requests
+import rwdl
+
+BLOCK = os.urandom(1024 * 1024)
+
+def serve(port, size, ready):
+    """Serve size bytes of pseudo-random data on every GET"""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Length', str(size))
+            self.end_headers()
+            left = size
+            while left:
+                n = min(left, len(BLOCK))
+                self.wfile.write(BLOCK[:n])
+                left -= n
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    ready.set()
+    server.serve_forever()
+
+def legacy(session, url, path):
+    """The original download_file() loop"""
+    response = session.get(url, headers={'Accept-Encoding': 'identity'}, stream=True, timeout=10)
+    with open(path, 'wb') as f:
+        for chunk in response.iter_content(chunk_size=8192):
+            f.write(chunk)
+
+def low_copy(session, url, path):
+    """rwdl's write path, as used by download_file() for fresh downloads"""
+    response = session.get(url, headers={'Accept-Encoding': 'identity'}, stream=True, timeout=10)
+    total = int(response.headers['Content-Length'])
+    with open(path, 'wb', buffering=0) as f:
+        rwdl.preallocate(f, total)
+        rwdl.copy_stream(response, f, total)
+
+def measure(fn, session, url, path, repeat):
+    """Best wall time and CPU time out of repeat runs"""
+    best_wall = best_cpu = float('inf')
+    for _ in range(repeat):
+        if os.path.exists(path):
+            os.remove(path)
+        wall, cpu = time.perf_counter(), time.process_time()
+        fn(session, url, path)
+        best_wall = min(best_wall, time.perf_counter() - wall)
+        best_cpu = min(best_cpu, time.process_time() - cpu)
+    return best_wall, best_cpu
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the rwdl write path')
+    parser.add_argument('--size', type=rwdl.parse_size_arg, default=512 * 1024 ** 2,
+                        help='Bytes to download per run (default: 512M)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per variant (default: 3)')
+    parser.add_argument('--port', type=int, default=8799, help='Local server port (default: 8799)')
+    parser.add_argument('--dir', default=None, help='Where to write the files (default: temp dir)')
+    args = parser.parse_args()
+
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(target=serve, args=(args.port, args.size, ready), daemon=True)
+    server.start()
+    ready.wait()
+
+    url = f'http://127.0.0.1:{args.port}/blob'
+    session = requests.Session()
+    gib = args.size / 1024 ** 3
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        path = os.path.join(tmp, 'blob')
+        print(f"{'variant':<12} {'MB/s':>9} {'CPU s/GB':>9}")
+        for name, fn in (('iter_content', legacy), ('copy_stream', low_copy)):
+            wall, cpu = measure(fn, session, url, path, args.repeat)
+            print(f"{name:<12} {args.size / wall / 1e6:>9.1f} {cpu / gib:>9.3f}")
+    server.terminate()
+
+if __name__ == '__main__':
+    main()
@@ -6,14 +6,38 @@
 ################################################
 
 import os
+import re
+import fnmatch
 import argparse
 import time
+import random
+import sqlite3
+import threading
+import json
+import shutil
+import hashlib
+import http.client
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
 from bs4 import BeautifulSoup
-from urllib.parse import urljoin
-from collections import deque
+from urllib.parse import urljoin, urlsplit, quote, unquote
+from collections import deque, namedtuple
+from email.utils import parsedate_to_datetime, formatdate
+from datetime import datetime, timezone
+from html import unescape
+from html.parser import HTMLParser
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 import sys
 
+HEADERS = {
+    # Custom headers to mimic a browser request
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:125.0) Gecko/20100101 Firefox/125.0'
+}
+
 class VersionAction(argparse.Action):
     def __init__(self, option_strings, version=None, dest=argparse.SUPPRESS, default=argparse.SUPPRESS, help="Show version and exit"):
         super().__init__(option_strings=option_strings, dest=dest, default=default, nargs=0, help=help)
@@ -74,6 +98,14 @@ the directory structure of the source.
 Usage:
   python rwdl.py [-h] [--version] --url URL [--depth DEPTH] 
                  --extension EXTENSION [--output OUTPUT] [--delay DELAY]
+                 [--max-rate RATE] [--backoff-max SECONDS]
+                 [--min-size SIZE] [--max-size SIZE] [--newer-than WHEN]
+                 [--include PATTERN] [--exclude PATTERN]
+                 [--retries RETRIES] [--state STATE] [--resume] [--sync]
+                 [--segments N] [--segment-threshold SIZE] [--drop-cache-above SIZE]
+                 [--dedup-store DIR] [--dedup-link {hardlink,reflink}]
+                 [--workers WORKERS] [--per-host PER_HOST] [--quiet]
+                 [--stats-file FILE] [--stats-interval SECONDS] [--metrics-port PORT]
 
 options:
   -h, --help                           show this help message and exit
@@ -82,7 +114,30 @@ options:
   --depth DEPTH, -d DEPTH              Recursion depth (0=base only)
   --extension EXTENSION, -e EXTENSION  Comma-separated file extensions to download (e.g., .torrent,.exe)
   --output OUTPUT, -o OUTPUT           Output base directory (default: ./downloads)
-  --delay DELAY                        Delay between requests in seconds (default: 0.5)
+  --delay DELAY                        Initial delay between requests to a host in seconds;
+                                       adapts to the server at runtime (default: 0.5)
+  --max-rate RATE                      Upper bound on requests per second per host (default: 10)
+  --backoff-max SECONDS                Longest wait between retries in seconds (default: 60)
+  --min-size SIZE                      Skip files smaller than this (e.g. 500K, 1.5G)
+  --max-size SIZE                      Skip files larger than this (e.g. 500K, 1.5G)
+  --newer-than WHEN                    Only files modified after a date (2024-01-31) or within an age (7d, 12h)
+  --include PATTERN                    Only files matching this glob (or re:REGEX); repeatable
+  --exclude PATTERN                    Skip files/directories matching this glob (or re:REGEX); repeatable
+  --retries RETRIES                    Retries per request after a transient failure (default: 3)
+  --state STATE                        Crawl state database (default: OUTPUT/.rwdl-state.sqlite)
+  --resume                             Continue the crawl recorded in the state database
+  --sync                               Re-check existing files and listings with conditional requests
+  --segments N                         Fetch large files as N parallel byte ranges (default: 1)
+  --segment-threshold SIZE             Minimum size for segmented downloads (default: 64M)
+  --drop-cache-above SIZE              Keep files of this size or more out of the page cache (e.g. 1G)
+  --dedup-store DIR                    Content-addressed store; duplicate files become links into it
+  --dedup-link {hardlink,reflink}      How files are linked to the dedup store (default: hardlink)
+  --workers WORKERS, -w WORKERS        Parallel listing/download workers (default: 1)
+  --per-host PER_HOST                  Max concurrent connections per host (default: 4)
+  --quiet, -q                          Only print errors and the final summary
+  --stats-file FILE                    Append a JSON metrics snapshot to this file periodically
+  --stats-interval SECONDS             Seconds between --stats-file snapshots (default: 10)
+  --metrics-port PORT                  Serve Prometheus metrics on 127.0.0.1:PORT/metrics
 
 Examples:
 ---------
@@ -91,6 +146,8 @@ Examples:
   • python rwdl.py --url http://files.site.com/ --extension .zip --depth 1 
     --output ./downloads
 
+  • python rwdl.py -u http://mirror.site.com/pub/ -e .iso -d 3 -w 8 --per-host 4
+
                     For more information, visit:
 
  - https://github.com/4ngel2769/side-projects/tree/main/scripts/rwdl -
@@ -118,118 +175,1983 @@ def create_arg_parser():
     parser.add_argument('--output', '-o', default='./downloads',
                         help='Output base directory (default: ./downloads)')
     parser.add_argument('--delay', type=float, default=0.5,
-                        help='Delay between requests in seconds (default: 0.5)')
+                        help='Initial delay between requests to a host in seconds; '
+                             'adapts to the server at runtime (default: 0.5)')
+    parser.add_argument('--max-rate', type=float, default=10.0,
+                        help='Upper bound on requests per second per host (default: 10)')
+    parser.add_argument('--backoff-max', type=float, default=60.0,
+                        help='Longest wait between retries in seconds (default: 60)')
+    parser.add_argument('--min-size', type=parse_size_arg,
+                        help='Skip files smaller than this (e.g. 500K, 1.5G)')
+    parser.add_argument('--max-size', type=parse_size_arg,
+                        help='Skip files larger than this (e.g. 500K, 1.5G)')
+    parser.add_argument('--newer-than', type=parse_time_arg,
+                        help='Only files modified after a date (2024-01-31) or within an age (7d, 12h)')
+    parser.add_argument('--include', action='append',
+                        help='Only files matching this glob (or re:REGEX); repeatable')
+    parser.add_argument('--exclude', action='append',
+                        help='Skip files/directories matching this glob (or re:REGEX); repeatable')
+    parser.add_argument('--retries', type=int, default=3,
+                        help='Retries per request after a transient failure (default: 3)')
+    parser.add_argument('--state',
+                        help='Crawl state database (default: OUTPUT/.rwdl-state.sqlite)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue the crawl recorded in the state database')
+    parser.add_argument('--sync', action='store_true',
+                        help='Re-check existing files and listings with conditional requests')
+    parser.add_argument('--segments', type=int, default=1,
+                        help='Fetch large files as N parallel byte ranges (default: 1)')
+    parser.add_argument('--segment-threshold', type=parse_size_arg, default=64 * 1024 ** 2,
+                        help='Minimum size for segmented downloads (default: 64M)')
+    parser.add_argument('--drop-cache-above', type=parse_size_arg,
+                        help='Keep files of this size or more out of the page cache (e.g. 1G)')
+    parser.add_argument('--dedup-store',
+                        help='Content-addressed store; duplicate files become links into it')
+    parser.add_argument('--dedup-link', choices=['hardlink', 'reflink'], default='hardlink',
+                        help='How files are linked to the dedup store (default: hardlink)')
+    parser.add_argument('--workers', '-w', type=int, default=1,
+                        help='Parallel listing/download workers (default: 1)')
+    parser.add_argument('--per-host', type=int, default=4,
+                        help='Max concurrent connections per host (default: 4)')
+    parser.add_argument('--quiet', '-q', action='store_true',
+                        help='Only print errors and the final summary')
+    parser.add_argument('--stats-file',
+                        help='Append a JSON metrics snapshot to this file periodically')
+    parser.add_argument('--stats-interval', type=float, default=10.0,
+                        help='Seconds between --stats-file snapshots (default: 10)')
+    parser.add_argument('--metrics-port', type=int,
+                        help='Serve Prometheus metrics on 127.0.0.1:PORT/metrics')
     
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.workers < 1 or args.per_host < 1 or args.segments < 1:
+        parser.error('--workers, --per-host and --segments must be at least 1')
+    if args.max_rate <= 0 or args.delay < 0:
+        parser.error('--max-rate must be positive and --delay not negative')
+    if args.stats_interval <= 0:
+        parser.error('--stats-interval must be positive')
+    return args
 
 def normalize_url(url):
     """Ensure URL ends with a slash"""
     return url if url.endswith('/') else url + '/'
 
 def is_valid_extension(filename, extensions):
-    """Check if file has one of the target extensions"""
-    return any(filename.endswith(ext) for ext in extensions)
+    """Check if file has one of the target extensions (a tuple)"""
+    return filename.endswith(extensions)
 
-def download_file(url, local_path):
-    """Download file with error handling"""
-    try:
-        response = requests.get(url, headers=HEADERS, stream=True, timeout=10)
-        response.raise_for_status()
-        with open(local_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
+def parse_size_arg(value):
+    """argparse type for sizes such as 500K, 1.5G or 1048576"""
+    size = parse_listing_size(value)
+    if size is None or value.strip() != SIZE_RE.match(value).group(0).strip():
+        raise argparse.ArgumentTypeError(f"Bad size: {value!r}")
+    return size
+
+def parse_time_arg(value):
+    """argparse type for --newer-than: a date (2024-01-31 [12:00]) or an age (7d, 12h, 2w)"""
+    m = re.match(r'^(\d+(?:\.\d+)?)([mhdw])$', value.strip())
+    if m:
+        seconds = float(m.group(1)) * {'m': 60, 'h': 3600, 'd': 86400, 'w': 604800}[m.group(2)]
+        return time.time() - seconds
+    for fmt in ('%Y-%m-%d', '%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M:%S'):
+        try:
+            return datetime.strptime(value.strip(), fmt).replace(tzinfo=timezone.utc).timestamp()
+        except ValueError:
+            continue
+    raise argparse.ArgumentTypeError(f"Bad date or age: {value!r}")
+
+class FileFilter:
+    """
+    Selection predicates compiled once per run.
+
+    Name checks (extension, --include/--exclude) are decided from the URL
+    alone; size and date checks use the listing columns, and only when a
+    listing lacks them does the download worker fall back to a HEAD request.
+    Patterns are globs matched against the path relative to the base URL
+    (directories end with '/'), or regular expressions when prefixed 're:'.
+    """
+    def __init__(self, extensions, min_size=None, max_size=None, newer_than=None,
+                 include=None, exclude=None):
+        self.extensions = tuple(extensions)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.newer_than = newer_than
+        self.include = self.compile(include)
+        self.exclude = self.compile(exclude)
+        self.needs_size = min_size is not None or max_size is not None
+        self.needs_mtime = newer_than is not None
+
+    @staticmethod
+    def compile(patterns):
+        """Fold all patterns into one regex evaluated with a single match()"""
+        if not patterns:
+            return None
+        parts = []
+        for pattern in patterns:
+            if pattern.startswith('re:'):
+                parts.append(f'.*?(?:{pattern[3:]})')
+            else:
+                parts.append(fnmatch.translate(pattern))
+        return re.compile('|'.join(f'(?:{part})' for part in parts))
+
+    def allows_dir(self, relpath):
+        """Prune whole subdirectories before they are queued"""
+        if self.exclude is None:
+            return True
+        name = relpath.rstrip('/').rsplit('/', 1)[-1] + '/'
+        return not (self.exclude.match(relpath) or self.exclude.match(name))
+
+    def allows_name(self, relpath):
+        filename = relpath.rsplit('/', 1)[-1]
+        if not is_valid_extension(filename, self.extensions):
+            return False
+        if self.include and not (self.include.match(relpath) or self.include.match(filename)):
+            return False
+        if self.exclude and (self.exclude.match(relpath) or self.exclude.match(filename)):
+            return False
         return True
+
+    def allows_meta(self, size, mtime):
+        """True/False, or None when a value needed to decide is missing"""
+        if self.needs_size:
+            if size is None:
+                return None
+            if self.min_size is not None and size < self.min_size:
+                return False
+            if self.max_size is not None and size > self.max_size:
+                return False
+        if self.needs_mtime:
+            if mtime is None:
+                return None
+            if mtime < self.newer_than:
+                return False
+        return True
+
+VERBOSE = True
+
+def log(message):
+    """Per-file progress line; silenced by --quiet (errors still use print)"""
+    if VERBOSE:
+        print(message)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Metrics:
+    """
+    Thread-safe run metrics: counters, per-phase timers, per-host latency
+    histograms and the size of the remaining queue, from which throughput
+    and an ETA are derived.
+
+    Phase times are summed over all worker threads, so with several workers
+    they add up to more than the wall clock; compare them with each other.
+    The ETA only covers files discovered so far.
+    """
+    PHASES = ('listing', 'parse', 'probe', 'download', 'wait', 'backoff')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self._start = time.monotonic()
+        self.counters = {}
+        self.statuses = {}
+        self.phases = {name: [0, 0.0] for name in self.PHASES}   # [count, seconds]
+        self.hosts = {}     # host -> [bucket counts (+Inf last), sum, count]
+        self.backlog = {'dirs': 0, 'files': 0}
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_bytes(self, n):
+        self.count('bytes_downloaded', n)
+
+    def add_time(self, phase, seconds):
+        with self._lock:
+            entry = self.phases[phase]
+            entry[0] += 1
+            entry[1] += seconds
+
+    @contextmanager
+    def timed(self, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase, time.perf_counter() - start)
+
+    def observe(self, url, status, latency):
+        """Record one HTTP response (status None = connection error)"""
+        host = urlsplit(url).netloc
+        with self._lock:
+            key = str(status) if status is not None else 'error'
+            self.statuses[key] = self.statuses.get(key, 0) + 1
+            if latency is None:
+                return
+            hist = self.hosts.get(host)
+            if hist is None:
+                hist = self.hosts[host] = [[0] * (len(LATENCY_BUCKETS) + 1), 0.0, 0]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if latency <= bound:
+                    break
+            else:
+                i = len(LATENCY_BUCKETS)
+            hist[0][i] += 1
+            hist[1] += latency
+            hist[2] += 1
+
+    def set_backlog(self, dirs, files):
+        """Publish the unfinished directory and file counts (called by the coordinator)"""
+        with self._lock:
+            self.backlog = {'dirs': dirs, 'files': files}
+
+    def snapshot(self):
+        """Current metrics as a JSON-serialisable dict"""
+        with self._lock:
+            elapsed = time.monotonic() - self._start
+            counters = dict(self.counters)
+            finished = sum(counters.get(name, 0) for name in
+                           ('files_done', 'files_unchanged', 'files_skipped', 'files_failed'))
+            files_rate = finished / elapsed if elapsed else 0.0
+            hosts = {}
+            for host, (buckets, total, n) in self.hosts.items():
+                cumulative, running = {}, 0
+                for bound, hits in zip(LATENCY_BUCKETS + ('+Inf',), buckets):
+                    running += hits
+                    cumulative[str(bound)] = running
+                hosts[host] = {'count': n, 'sum': round(total, 6), 'mean': round(total / n, 6),
+                               'buckets': cumulative}
+            remaining = self.backlog['files']
+            return {
+                'time': time.time(),
+                'elapsed': round(elapsed, 3),
+                'counters': counters,
+                'statuses': dict(self.statuses),
+                'phases': {name: {'count': c, 'seconds': round(s, 3)}
+                           for name, (c, s) in self.phases.items()},
+                'files_per_second': round(files_rate, 3),
+                'bytes_per_second': round(counters.get('bytes_downloaded', 0) / elapsed, 1)
+                                    if elapsed else 0.0,
+                'backlog': dict(self.backlog),
+                'eta_seconds': round(remaining / files_rate, 1) if files_rate else None,
+                'hosts': hosts,
+            }
+
+    def prometheus(self):
+        """Current metrics in the Prometheus text exposition format"""
+        snap = self.snapshot()
+        lines = ['# TYPE rwdl_elapsed_seconds gauge',
+                 f"rwdl_elapsed_seconds {snap['elapsed']}"]
+        lines.append('# TYPE rwdl_events_total counter')
+        for name, value in sorted(snap['counters'].items()):
+            lines.append(f'rwdl_events_total{{event="{name}"}} {value}')
+        lines.append('# TYPE rwdl_responses_total counter')
+        for status, value in sorted(snap['statuses'].items()):
+            lines.append(f'rwdl_responses_total{{status="{status}"}} {value}')
+        lines.append('# TYPE rwdl_phase_seconds_total counter')
+        for name, phase in snap['phases'].items():
+            lines.append(f'rwdl_phase_seconds_total{{phase="{name}"}} {phase["seconds"]}')
+        lines.append('# TYPE rwdl_backlog gauge')
+        for table, value in snap['backlog'].items():
+            lines.append(f'rwdl_backlog{{table="{table}"}} {value}')
+        if snap['eta_seconds'] is not None:
+            lines += ['# TYPE rwdl_eta_seconds gauge', f"rwdl_eta_seconds {snap['eta_seconds']}"]
+        lines.append('# TYPE rwdl_response_latency_seconds histogram')
+        for host, hist in snap['hosts'].items():
+            for bound, value in hist['buckets'].items():
+                lines.append(f'rwdl_response_latency_seconds_bucket{{host="{host}",le="{bound}"}} {value}')
+            lines.append(f'rwdl_response_latency_seconds_sum{{host="{host}"}} '
+                         f"{hist['sum']}")
+            lines.append(f'rwdl_response_latency_seconds_count{{host="{host}"}} {hist["count"]}')
+        return '\n'.join(lines) + '\n'
+
+class StatsReporter:
+    """
+    Background thread that appends a metrics snapshot to a JSON-lines file
+    every interval seconds (and once more on stop), and optionally serves
+    /metrics for Prometheus on 127.0.0.1.
+    """
+    def __init__(self, metrics, path=None, interval=10.0, port=None):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self.server = None
+        if port is not None:
+            self.server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+            self.server.daemon_threads = True
+
+    def _handler(self):
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+        return Handler
+
+    def write(self):
+        if self.path:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(self.metrics.snapshot()) + '\n')
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def start(self):
+        if self.server:
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        if self.path:
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.write()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+def print_summary(metrics):
+    """One-screen breakdown of where the run spent its time"""
+    snap = metrics.snapshot()
+    counters = snap['counters']
+    print(f"\nSummary: {counters.get('files_done', 0)} downloaded, "
+          f"{counters.get('files_unchanged', 0)} unchanged, "
+          f"{counters.get('files_skipped', 0)} filtered, "
+          f"{counters.get('files_failed', 0)} failed, "
+          f"{counters.get('dirs_done', 0)} directories listed")
+    print(f"  {counters.get('bytes_downloaded', 0) / 1e6:.1f} MB in {snap['elapsed']:.1f}s "
+          f"({snap['bytes_per_second'] / 1e6:.2f} MB/s, {snap['files_per_second']:.1f} files/s), "
+          f"{sum(snap['statuses'].values())} requests, {counters.get('retries', 0)} retries")
+    busy = [(name, phase) for name, phase in snap['phases'].items() if phase['count']]
+    if busy:
+        print("  Worker time: " + ', '.join(
+            f"{name} {phase['seconds']:.1f}s" for name, phase in busy))
+
+# Responses that mean "slow down" rather than "this will never work"
+THROTTLE_STATUSES = {429, 503}
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+def parse_retry_after(value):
+    """Retry-After as seconds from now (delta-seconds or HTTP date), or None"""
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return float(value)
+    when = http_date_to_epoch(value)
+    return max(0.0, when - time.time()) if when is not None else None
+
+class AdaptiveLimiter:
+    """
+    Per-host token bucket whose rate adapts to how each server copes.
+
+    Every host starts at initial_rate requests/s. Healthy responses raise the
+    rate additively up to max_rate; throttling (429/503), connection errors
+    and response times climbing well above the host's best observed latency
+    cut it multiplicatively. A Retry-After header pauses the host entirely
+    until the given time.
+    """
+    INCREASE = 0.25          # requests/s added per healthy response
+    DECREASE = 0.5           # factor applied on throttling
+    SLOW_DECREASE = 0.8      # factor applied when latency climbs
+    SLOW_FACTOR = 2.0        # latency EWMA vs baseline that counts as "slow"
+    COOLDOWN = 1.0           # seconds between two decreases
+
+    class Host:
+        def __init__(self, rate):
+            self.lock = threading.Lock()
+            self.rate = rate
+            self.tokens = 1.0
+            self.refilled = time.monotonic()
+            self.blocked_until = 0.0
+            self.latency = None      # EWMA of time to first byte
+            self.baseline = None     # best latency EWMA seen so far
+            self.last_decrease = 0.0
+
+    def __init__(self, initial_rate, max_rate, min_rate=0.05):
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate)
+        self.initial_rate = max(self.min_rate, min(initial_rate, max_rate))
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def host(self, url):
+        name = urlsplit(url).netloc
+        with self._lock:
+            host = self._hosts.get(name)
+            if host is None:
+                host = self._hosts[name] = self.Host(self.initial_rate)
+            return host
+
+    def acquire(self, url):
+        """Block until the host of url may receive another request"""
+        host = self.host(url)
+        while True:
+            with host.lock:
+                now = time.monotonic()
+                host.tokens = min(1.0, host.tokens + (now - host.refilled) * host.rate)
+                host.refilled = now
+                if now < host.blocked_until:
+                    wait_for = host.blocked_until - now
+                elif host.tokens >= 1.0:
+                    host.tokens -= 1.0
+                    return
+                else:
+                    wait_for = (1.0 - host.tokens) / host.rate
+            time.sleep(wait_for)
+
+    def record(self, url, status, latency=None, retry_after=None):
+        """Feed back the outcome of a request (status None = connection error)"""
+        host = self.host(url)
+        with host.lock:
+            now = time.monotonic()
+            if retry_after:
+                host.blocked_until = max(host.blocked_until, now + retry_after)
+            if status is None or status in THROTTLE_STATUSES:
+                self._decrease(host, now, self.DECREASE)
+                return
+            if latency is not None:
+                host.latency = latency if host.latency is None else 0.8 * host.latency + 0.2 * latency
+                if host.baseline is None or host.latency < host.baseline:
+                    host.baseline = host.latency
+                if host.latency > self.SLOW_FACTOR * max(host.baseline, 0.01):
+                    self._decrease(host, now, self.SLOW_DECREASE)
+                    return
+            host.rate = min(self.max_rate, host.rate + self.INCREASE)
+
+    def _decrease(self, host, now, factor):
+        if now - host.last_decrease >= self.COOLDOWN:
+            host.rate = max(self.min_rate, host.rate * factor)
+            host.last_decrease = now
+
+class IncompleteDownload(IOError):
+    """The server delivered fewer (or different) bytes than announced"""
+
+class TransferInterrupted(BaseException):
+    """
+    The crawl was interrupted (CTRL+C) while a body was streaming; a
+    BaseException so the retry loops let it through and the .part stays
+    """
+
+class RetryPolicy:
+    """Bounded exponential backoff with jitter for transient failures"""
+    def __init__(self, retries=3, base=1.0, maximum=60.0, metrics=None):
+        self.retries = retries
+        self.base = base
+        self.maximum = maximum
+        self.metrics = metrics
+
+    def backoff(self, attempt):
+        """Seconds to wait before retry number attempt (1-based)"""
+        delay = min(self.maximum, self.base * 2 ** (attempt - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    @staticmethod
+    def is_transient(error):
+        """Whether an exception raised while fetching is worth retrying"""
+        if isinstance(error, requests.HTTPError) and error.response is not None:
+            return error.response.status_code in RETRY_STATUSES
+        return isinstance(error, (requests.ConnectionError, requests.Timeout,
+                                  requests.exceptions.ChunkedEncodingError,
+                                  IncompleteDownload))
+
+    def attempts(self, label):
+        """Yield attempt numbers, sleeping with backoff between them"""
+        for attempt in range(self.retries + 1):
+            if attempt:
+                delay = self.backoff(attempt)
+                log(f"  ↻ Retrying in {delay:.1f}s ({attempt}/{self.retries}): {label}")
+                time.sleep(delay)
+                if self.metrics:
+                    self.metrics.count('retries')
+                    self.metrics.add_time('backoff', delay)
+            yield attempt
+
+class ThrottledSession(requests.Session):
+    """
+    Session that paces every request through an AdaptiveLimiter, and reports
+    the time spent waiting for it and each response's latency to metrics.
+    """
+    def __init__(self, limiter, metrics=None):
+        super().__init__()
+        self.limiter = limiter
+        self.metrics = metrics
+
+    def request(self, method, url, *args, **kwargs):
+        if self.metrics:
+            with self.metrics.timed('wait'):
+                self.limiter.acquire(url)
+        else:
+            self.limiter.acquire(url)
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            self.limiter.record(url, None)
+            if self.metrics:
+                self.metrics.observe(url, None, None)
+            raise
+        latency = response.elapsed.total_seconds()
+        self.limiter.record(url, response.status_code, latency,
+                            parse_retry_after(response.headers.get('Retry-After')))
+        if self.metrics:
+            self.metrics.observe(url, response.status_code, latency)
+        return response
+
+def create_session(pool_size, limiter, metrics=None):
+    """Create a keep-alive, rate limited session shared by all workers"""
+    session = ThrottledSession(limiter, metrics)
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+class HostSlots:
+    """Limit the number of concurrent connections opened to each host"""
+    def __init__(self, limit):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._slots = {}
+
+    def slot(self, url):
+        """Return the semaphore guarding the host of url"""
+        host = urlsplit(url).netloc
+        with self._lock:
+            sem = self._slots.get(host)
+            if sem is None:
+                sem = self._slots[host] = threading.BoundedSemaphore(self.limit)
+            return sem
+
+def parse_content_range(value):
+    """Parse 'bytes start-end/total' into (start, total); total may be None"""
+    try:
+        _, _, spec = value.partition(' ')
+        span, _, total = spec.partition('/')
+        start = None if span == '*' else int(span.split('-')[0])
+        return start, (None if total in ('', '*') else int(total))
+    except ValueError:
+        return None, None
+
+# Result of a file download; unchanged is set when the server answered 304,
+# skipped when a HEAD request showed the file does not pass the filters,
+# sha256 when the content was hashed and deduped when it came from the store
+DownloadResult = namedtuple('DownloadResult',
+                            'ok unchanged etag last_modified size skipped sha256 deduped',
+                            defaults=(False, None, None, None, False, None, False))
+
+# Result of a directory listing fetch; links is None when the server answered 304
+Listing = namedtuple('Listing', 'links etag last_modified')
+
+# One link of a directory listing, with size (bytes) and mtime (POSIX time)
+# when the listing shows them
+Entry = namedtuple('Entry', 'href size mtime', defaults=(None, None))
+
+def http_date_to_epoch(value):
+    """Convert an HTTP date header into a POSIX timestamp (None if unparsable)"""
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+def conditional_headers(etag=None, last_modified=None):
+    """Build If-None-Match / If-Modified-Since headers from stored validators"""
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    return headers
+
+def probe_file(session, url, validators=None):
+    """HEAD url (optionally conditional); returns the response or None on failure"""
+    headers = {'Accept-Encoding': 'identity'}
+    headers.update(validators or {})
+    try:
+        response = session.head(url, headers=headers, allow_redirects=True, timeout=10)
+        if response.status_code != 304:
+            response.raise_for_status()
+        return response
     except Exception as e:
-        print(f"  ✗ Download failed: {str(e)}")
+        print(f"  ✗ HEAD failed: {str(e)}")
+        return None
+
+def probe_metadata(response):
+    """Return (size, mtime) announced by a HEAD response; (None, None) without one"""
+    if response is None:
+        return None, None
+    length = response.headers.get('Content-Length')
+    return (int(length) if length and length.isdigit() else None,
+            http_date_to_epoch(response.headers.get('Last-Modified')))
+
+MIN_CHUNK = 64 * 1024
+MAX_CHUNK = 4 * 1024 * 1024
+PREALLOCATE_MIN = 8 * 1024 * 1024       # smaller files are not worth a segment map
+DROP_CACHE_EVERY = 64 * 1024 * 1024     # flush + evict written pages this often
+SEGMENT_MAP_EVERY = 5.0                 # seconds between segment map saves
+_buffers = threading.local()
+
+def stream_buffer():
+    """This thread's reusable receive buffer"""
+    buf = getattr(_buffers, 'view', None)
+    if buf is None:
+        buf = _buffers.view = memoryview(bytearray(MAX_CHUNK))
+    return buf
+
+def preallocate(f, size):
+    """Reserve disk space for size bytes (sparse truncate where fallocate is missing)"""
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(f.fileno(), 0, size)
+            return
+        except OSError:
+            pass    # e.g. filesystems without fallocate support
+    f.truncate(size)
+
+def drop_page_cache(fd, start, end):
+    """Write back and evict [start, end) of a file from the page cache"""
+    if hasattr(os, 'posix_fadvise'):
+        os.fdatasync(fd)
+        os.posix_fadvise(fd, start, end - start, os.POSIX_FADV_DONTNEED)
+
+def read_body(response, buf):
+    """
+    Read the next part (at most len(buf) bytes) of an identity-encoded body;
+    returns an empty result at the end. Bodies of known length are read
+    through the http.client response under urllib3, which fills buf straight
+    from the socket, and a view of buf is returned; urllib3's own readinto()
+    would allocate a bytes object per read and copy it, so chunked bodies
+    just return what read() gives.
+    """
+    raw = response.raw
+    fp = getattr(raw, '_fp', None)
+    try:
+        if isinstance(fp, http.client.HTTPResponse) and not fp.chunked:
+            n = fp.readinto(buf)
+            if fp.isclosed():
+                # Body complete: hand the connection back like urllib3 would
+                raw.release_conn()
+            return buf[:n]
+        return raw.read(len(buf))
+    except (TimeoutError, ReadTimeoutError) as e:
+        # Same exceptions requests' iter_content would have raised
+        raise requests.ConnectionError(e)
+    except (ProtocolError, http.client.HTTPException, OSError) as e:
+        raise requests.exceptions.ChunkedEncodingError(e)
+
+def copy_stream(response, f, limit=None, drop_cache=False, on_write=None, hasher=None):
+    """
+    Copy a response body into the unbuffered file f at its current position
+    and return the number of bytes written (at most limit).
+
+    Identity-encoded bodies are read into a reusable per-thread buffer (see
+    read_body); the read size starts at MIN_CHUNK and doubles up to MAX_CHUNK
+    while reads keep filling it. drop_cache periodically flushes and evicts
+    written pages so huge files do not push everything else out of the page
+    cache. on_write is called with the byte count after every write, and
+    hasher (a hashlib object) sees every byte as it goes by, so no second
+    read is needed.
+    """
+    encoding = response.headers.get('Content-Encoding', 'identity').lower()
+    if encoding not in ('identity', ''):
+        # Compressed bodies still have to go through requests' decoder
+        written = 0
+        for chunk in response.iter_content(chunk_size=MIN_CHUNK):
+            if limit is not None:
+                chunk = chunk[:limit - written]
+            f.write(chunk)
+            written += len(chunk)
+            if hasher:
+                hasher.update(chunk)
+            if on_write:
+                on_write(len(chunk))
+            if limit is not None and written >= limit:
+                break
+        return written
+
+    buf = stream_buffer()
+    size = MIN_CHUNK
+    written = 0
+    start = flushed = f.tell()
+    while limit is None or written < limit:
+        want = size if limit is None else min(size, limit - written)
+        view = read_body(response, buf[:want])
+        n = len(view)
+        if not n:
+            break
+        if hasher:
+            hasher.update(view)
+        while view:
+            view = view[f.write(view):]
+        written += n
+        if on_write:
+            on_write(n)
+        if n == want and size < MAX_CHUNK:
+            size *= 2
+        if drop_cache and start + written - flushed >= DROP_CACHE_EVERY:
+            drop_page_cache(f.fileno(), flushed, start + written)
+            flushed = start + written
+    if drop_cache and start + written > flushed:
+        drop_page_cache(f.fileno(), flushed, start + written)
+    return written
+
+def hash_file(path, hasher, length=None):
+    """Feed the first length bytes of a file (all of it by default) to hasher"""
+    buf = stream_buffer()
+    left = length
+    with open(path, 'rb', buffering=0) as f:
+        while left is None or left > 0:
+            n = f.readinto(buf if left is None else buf[:min(left, len(buf))])
+            if not n:
+                break
+            hasher.update(buf[:n])
+            if left is not None:
+                left -= n
+    return hasher
+
+def download_file(session, url, local_path, retry=None, validators=None,
+                  drop_cache_above=None, checksum=False, on_write=None):
+    """
+    Download file into '<local_path>.part', resuming with HTTP Range requests
+    after a failure (or from a previous run), and rename it into place only
+    once its length matches what the server announced.
+
+    validators are extra conditional headers (If-None-Match/If-Modified-Since);
+    when the server answers 304 the local file is left untouched. Transient
+    failures are retried according to the RetryPolicy retry. Files of
+    drop_cache_above bytes or more bypass the page cache (see copy_stream).
+    With checksum the content is SHA-256 hashed while it streams and the hex
+    digest returned in the result. on_write is passed on to copy_stream.
+
+    The If-Range validator (strong ETag or Last-Modified) of the response a
+    .part was started from is kept next to it, with its ETag and
+    Last-Modified, and sent with every resume, so a file that changed
+    upstream comes back whole (200) and is started over instead of having new
+    bytes appended to the old prefix. A .part without that record is not
+    trusted. A .part that already holds the whole file (416) is completed
+    with the recorded ETag and Last-Modified.
+
+    Fresh downloads of known length are preallocated. While that is going on
+    the .part size says nothing about progress, so a one-range segment map
+    recording the bytes written is kept next to it (an interrupted run cuts
+    the .part back to them and resumes) and the file is cut back to the bytes
+    actually written once the transfer stops.
+    """
+    retry = retry or RetryPolicy()
+    part_path = local_path + '.part'
+    if os.path.exists(part_path + SEGMENTS_SUFFIX):
+        # Preallocated .part left by a killed run: keep what it says was written
+        trim_preallocated(part_path)
+    found, saved = load_part_validator(part_path)
+    if not found:
+        # No record of which upstream version the bytes belong to
+        discard_partial(part_path)
+    if_range = saved.get('validator')
+    for _ in retry.attempts(os.path.basename(local_path)):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        # Ask for the raw bytes so lengths and offsets refer to the file itself
+        headers = {'Accept-Encoding': 'identity'}
+        headers.update(validators or {})
+        if offset:
+            headers['Range'] = f'bytes={offset}-'
+            if if_range:
+                headers['If-Range'] = if_range
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=10) as response:
+                if response.status_code == 304:
+                    if offset:
+                        discard_partial(part_path)
+                    return DownloadResult(True, unchanged=True)
+                if response.status_code == 416 and offset:
+                    # Nothing left to fetch if the .part already holds everything
+                    _, total = parse_content_range(response.headers.get('Content-Range', ''))
+                    if total == offset:
+                        sha256 = hash_file(part_path, hashlib.sha256()).hexdigest() if checksum else None
+                        return complete_partial(part_path, local_path, offset, saved.get('etag'),
+                                                saved.get('last_modified'), sha256)
+                    discard_partial(part_path)
+                    continue
+                response.raise_for_status()
+
+                if response.status_code == 206:
+                    start, total = parse_content_range(response.headers.get('Content-Range', ''))
+                    if start != offset:
+                        raise IncompleteDownload(f"server resumed at byte {start}, expected {offset}")
+                    mode = 'ab'
+                else:
+                    # Range ignored, file changed upstream (If-Range) or fresh
+                    # download: start over
+                    offset = 0
+                    length = response.headers.get('Content-Length')
+                    total = int(length) if length and length.isdigit() else None
+                    mode = 'wb'
+                    saved = {'etag': response.headers.get('ETag'),
+                             'last_modified': response.headers.get('Last-Modified')}
+                    if_range = saved['validator'] = if_range_validator(saved['etag'],
+                                                                       saved['last_modified'])
+                    save_part_validator(part_path, saved)
+
+                drop_cache = drop_cache_above is not None and (total or 0) >= drop_cache_above
+                hasher = hashlib.sha256() if checksum else None
+                if hasher and offset:
+                    hash_file(part_path, hasher, offset)
+                with open(part_path, mode, buffering=0) as f:
+                    if mode == 'wb' and total and total >= PREALLOCATE_MIN:
+                        plan = dict(saved, total=total, ranges=[[0, total - 1, 0]])
+                        save_segment_map(part_path, plan)
+                        saved = time.monotonic()
+
+                        def advance(n):
+                            nonlocal saved
+                            plan['ranges'][0][2] += n
+                            if on_write:
+                                on_write(n)
+                            if time.monotonic() - saved >= SEGMENT_MAP_EVERY:
+                                save_segment_map(part_path, plan)
+                                saved = time.monotonic()
+
+                        preallocate(f, total)
+                        try:
+                            copy_stream(response, f, total, drop_cache, advance, hasher)
+                        finally:
+                            f.truncate(f.tell())
+                            os.remove(part_path + SEGMENTS_SUFFIX)
+                    else:
+                        copy_stream(response, f, drop_cache=drop_cache, on_write=on_write,
+                                    hasher=hasher)
+                etag = response.headers.get('ETag') or saved.get('etag')
+                last_modified = response.headers.get('Last-Modified') or saved.get('last_modified')
+
+            size = os.path.getsize(part_path)
+            if total is not None and size != total:
+                raise IncompleteDownload(f"incomplete download: {size} of {total} bytes")
+            return complete_partial(part_path, local_path, size, etag, last_modified,
+                                    hasher.hexdigest() if hasher else None)
+        except Exception as e:
+            print(f"  ✗ Download failed: {str(e)}")
+            if not retry.is_transient(e):
+                break
+    return DownloadResult(False)
+
+def complete_partial(part_path, local_path, size, etag, last_modified, sha256):
+    """Move a finished .part into place and describe it in a DownloadResult"""
+    # Mirror the upstream mtime so If-Modified-Since works without a manifest
+    mtime = http_date_to_epoch(last_modified)
+    if mtime is not None:
+        os.utime(part_path, (mtime, mtime))
+    os.replace(part_path, local_path)
+    discard_partial(part_path)
+    return DownloadResult(True, etag=etag, last_modified=last_modified, size=size,
+                          sha256=sha256)
+
+SEGMENTS_SUFFIX = '.segments'
+VALIDATOR_SUFFIX = '.validator'
+
+class RangeNotSupported(Exception):
+    """The server ignored a Range request (or the file changed under us)"""
+
+def discard_partial(part_path):
+    """Remove a .part file and its segment map and validator, if any"""
+    for path in (part_path, part_path + SEGMENTS_SUFFIX, part_path + VALIDATOR_SUFFIX):
+        if os.path.exists(path):
+            os.remove(path)
+
+def save_segment_map(part_path, plan):
+    """Atomically write the segment map of a preallocated .part"""
+    map_path = part_path + SEGMENTS_SUFFIX
+    with open(map_path + '.tmp', 'w') as f:
+        json.dump(plan, f)
+    os.replace(map_path + '.tmp', map_path)
+
+def trim_preallocated(part_path):
+    """
+    Cut a preallocated .part back to the bytes its segment map records as
+    written from the start of the file, so it can be resumed linearly, and
+    drop the map. The .part is discarded when the map is unusable.
+    """
+    map_path = part_path + SEGMENTS_SUFFIX
+    try:
+        with open(map_path) as f:
+            plan = json.load(f)
+        start, _, done = plan['ranges'][0]
+    except (OSError, ValueError, KeyError, IndexError, TypeError):
+        start, done, plan = None, 0, {}
+    if start != 0 or not done or not os.path.exists(part_path):
+        discard_partial(part_path)
+        return
+    with open(part_path, 'r+b') as f:
+        f.truncate(done)
+    save_part_validator(part_path, plan)
+    os.remove(map_path)
+
+def load_part_validator(part_path):
+    """
+    Return (found, saved) for a linear .part: found is False when there is a
+    .part without a validator record; saved holds its 'validator' (If-Range),
+    'etag' and 'last_modified', any of which may be missing or None for
+    servers that send neither ETag nor Last-Modified.
+    """
+    if not os.path.exists(part_path):
+        return True, {}
+    try:
+        with open(part_path + VALIDATOR_SUFFIX) as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return False, {}
+    return True, saved if isinstance(saved, dict) else {}
+
+def save_part_validator(part_path, saved):
+    """Record the validator, ETag and Last-Modified a .part was started from"""
+    with open(part_path + VALIDATOR_SUFFIX, 'w') as f:
+        json.dump({key: saved.get(key) for key in ('validator', 'etag', 'last_modified')}, f)
+
+def supports_segments(probe, threshold):
+    """Whether a HEAD response allows a segmented download of a large file"""
+    if probe is None or probe.status_code != 200:
         return False
+    size, _ = probe_metadata(probe)
+    return (size is not None and size >= threshold and
+            probe.headers.get('Accept-Ranges', '').lower() == 'bytes')
+
+def if_range_validator(etag, last_modified):
+    """Value for If-Range: a strong ETag, else the Last-Modified date"""
+    if etag and not etag.startswith('W/'):
+        return etag
+    return last_modified
+
+def fetch_segment(session, url, part_path, segment, if_range, retry, drop_cache=False,
+                  on_write=None):
+    """
+    Fetch one byte range [start, end] into its place in the .part file.
+    segment is a mutable [start, end, done] list; done is advanced as data
+    is written so progress survives a failure.
+    """
+    label = f"{os.path.basename(part_path[:-5])} @{segment[0]}"
+    for _ in retry.attempts(label):
+        start, end = segment[0] + segment[2], segment[1]
+        if start > end:
+            return True
+        headers = {'Accept-Encoding': 'identity', 'Range': f'bytes={start}-{end}'}
+        if if_range:
+            headers['If-Range'] = if_range
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=10) as response:
+                response.raise_for_status()
+                if response.status_code != 206:
+                    raise RangeNotSupported(f"server answered {response.status_code} to a range request")
+                got, _ = parse_content_range(response.headers.get('Content-Range', ''))
+                if got != start:
+                    raise RangeNotSupported(f"server sent byte {got}, expected {start}")
+                def advance(n):
+                    segment[2] += n
+                    if on_write:
+                        on_write(n)
+
+                with open(part_path, 'r+b', buffering=0) as f:
+                    f.seek(start)
+                    # limit: never spill into the next range
+                    copy_stream(response, f, end + 1 - start, drop_cache, advance)
+            if segment[0] + segment[2] > end:
+                return True
+            raise IncompleteDownload(f"segment ended at byte {segment[0] + segment[2]}, expected {end + 1}")
+        except RangeNotSupported:
+            raise
+        except Exception as e:
+            print(f"  ✗ Segment failed: {str(e)}")
+            if not retry.is_transient(e):
+                break
+    return False
+
+def download_segmented(session, url, local_path, probe, segments, retry=None,
+                       drop_cache_above=None, checksum=False, on_write=None, slot=None):
+    """
+    Download a large file as several byte ranges fetched in parallel into a
+    preallocated '<local_path>.part'. Progress is kept in a small JSON map next
+    to it so an interrupted download resumes each range where it stopped.
+    At most segments ranges are in flight; with slot (a HostSlots semaphore,
+    not held by the caller) each of them also holds one host connection slot.
+
+    Returns a DownloadResult, or None when the server turned out not to
+    honour ranges and the caller should fall back to a single stream. Ranges
+    arrive out of order, so with checksum the file is hashed once at the end.
+    """
+    retry = retry or RetryPolicy()
+    part_path = local_path + '.part'
+    map_path = part_path + SEGMENTS_SUFFIX
+    total, _ = probe_metadata(probe)
+    etag = probe.headers.get('ETag')
+    last_modified = probe.headers.get('Last-Modified')
+    if_range = if_range_validator(etag, last_modified)
+
+    plan = None
+    if os.path.exists(map_path) and os.path.exists(part_path):
+        try:
+            with open(map_path) as f:
+                plan = json.load(f)
+        except ValueError:
+            plan = None
+        if not plan or plan.get('total') != total or plan.get('validator') != if_range:
+            plan = None     # different file upstream: start over
+    if plan is None:
+        discard_partial(part_path)
+        step = -(-total // segments)
+        plan = {'total': total, 'validator': if_range,
+                'ranges': [[start, min(start + step, total) - 1, 0]
+                           for start in range(0, total, step)]}
+        with open(part_path, 'wb') as f:
+            preallocate(f, total)
+
+    def save_plan():
+        save_segment_map(part_path, plan)
+
+    save_plan()
+    todo = [r for r in plan['ranges'] if r[0] + r[2] <= r[1]]
+    log(f"  ⇉ Segmented download: {len(todo)} of {len(plan['ranges'])} ranges to fetch")
+    ok = True
+    drop_cache = drop_cache_above is not None and total >= drop_cache_above
+
+    def fetch(segment):
+        with slot or nullcontext():
+            return fetch_segment(session, url, part_path, segment, if_range, retry,
+                                 drop_cache, on_write)
+
+    with ThreadPoolExecutor(max_workers=min(len(todo), segments) or 1) as pool:
+        futures = [pool.submit(fetch, r) for r in todo]
+        pending = set(futures)
+        while pending:
+            _, pending = wait(pending, timeout=SEGMENT_MAP_EVERY)
+            save_plan()
+        try:
+            ok = all(f.result() for f in futures)
+        except RangeNotSupported as e:
+            print(f"  ✗ {e}; falling back to a single stream")
+            discard_partial(part_path)
+            return None
+    save_plan()
+    if not ok:
+        return DownloadResult(False)
+
+    done = sum(r[2] for r in plan['ranges'])
+    size = os.path.getsize(part_path)
+    if done != total or size != total:
+        print(f"  ✗ Download failed: {done} of {total} bytes")
+        return DownloadResult(False)
+    mtime = http_date_to_epoch(last_modified)
+    if mtime is not None:
+        os.utime(part_path, (mtime, mtime))
+    sha256 = hash_file(part_path, hashlib.sha256()).hexdigest() if checksum else None
+    os.replace(part_path, local_path)
+    os.remove(map_path)
+    return DownloadResult(True, etag=etag, last_modified=last_modified, size=total,
+                          sha256=sha256)
+
+# Listing timestamps, matched once and built without strptime (which costs
+# more than the rest of a row): 2024-01-31 12:00[:00], 31-Jan-2024 12:00[:00]
+# and Caddy's ISO 8601 with optional fraction and offset; RFC 1123 for JSON
+LISTING_DATE_RE = re.compile(r'(?:(\d{4})-(\d\d)-(\d\d)|(\d\d)-([A-Za-z]{3})-(\d{4}))[ T]'
+                             r'(\d\d):(\d\d)(?::(\d\d))?(?:\.\d+)?(Z|[+-]\d\d:?\d\d)?$')
+HTTP_DATE_RE = re.compile(r'[A-Za-z]{3}, (\d\d) ([A-Za-z]{3}) (\d{4}) (\d\d):(\d\d):(\d\d) GMT$')
+MONTHS = {name: number for number, name in enumerate(
+    ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'), 1)}
+DATE_RE = re.compile(r'(\d{4}-\d\d-\d\d[ T]\d\d:\d\d(?::\d\d)?|'
+                     r'\d\d-[A-Za-z]{3}-\d{4} \d\d:\d\d(?::\d\d)?)')
+SIZE_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([KMGTP]?)(i?B)?\b', re.IGNORECASE)
+SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4, 'P': 1024 ** 5}
 
-def parse_directory(url):
-    """Parse directory listing and return valid links"""
+@lru_cache(maxsize=1024)
+def listing_day(year, month, day):
+    """POSIX time of 00:00 UTC on a listing date (None if invalid); rows share days"""
     try:
-        response = requests.get(url, headers=HEADERS, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        links = []
-        for link in soup.select('a[href]'):
-            href = link['href']
-            # Skip navigation links
-            if href in ['../', './'] or href.startswith(('?', '#')):
+        month = int(month) if month.isdigit() else MONTHS[month.lower()]
+        return datetime(int(year), month, int(day), tzinfo=timezone.utc).timestamp()
+    except (KeyError, ValueError):
+        return None
+
+def parse_listing_date(text):
+    """Parse the timestamp formats used by autoindex pages (assumed UTC)"""
+    text = text.strip()
+    if not text:
+        return None
+    m = HTTP_DATE_RE.match(text)
+    if m:
+        day, month, year, hour, minute, second = m.groups()
+        offset = None
+    elif ',' in text:
+        return http_date_to_epoch(text)
+    else:
+        m = LISTING_DATE_RE.match(text)
+        if not m:
+            return None
+        year, month, day, day2, month2, year2, hour, minute, second, offset = m.groups()
+        if year is None:
+            year, month, day = year2, month2, day2
+    stamp = listing_day(year, month, day)
+    hour, minute, second = int(hour), int(minute), int(second or 0)
+    if stamp is None or hour > 23 or minute > 59 or second > 60:
+        return None
+    stamp += hour * 3600 + minute * 60 + second
+    if offset and offset != 'Z':
+        sign = -1 if offset[0] == '-' else 1
+        hours, minutes = int(offset[1:3]), int(offset[-2:])
+        stamp -= sign * (hours * 3600 + minutes * 60)
+    return stamp
+
+def parse_listing_size(text):
+    """Parse '1234', '1.2M' or '1.2 KiB' into bytes; '-' and blanks give None"""
+    m = SIZE_RE.match(text)
+    if not m:
+        return None
+    number, unit, _ = m.groups()
+    return int(float(number) * SIZE_UNITS[unit.upper()])
+
+def is_listing_link(href):
+    """Filter out navigation and non-web links"""
+    # Skip navigation links and special protocols
+    return not (href in ('../', './') or
+                href.startswith(('?', '#', 'javascript:', 'mailto:', 'tel:')))
+
+def listing_entry(href, trailing, size=None, mtime=None):
+    """Entry for a link, with size and mtime taken from the text following it"""
+    m = DATE_RE.search(trailing)
+    if m:
+        if mtime is None:
+            mtime = parse_listing_date(m.group(1))
+        if size is None:
+            size = parse_listing_size(trailing[m.end():])
+    if href.endswith('/'):
+        size = None   # directory sizes are '-' or meaningless
+    return Entry(href, size, mtime)
+
+TITLE_TAG_RE = re.compile(r'<title>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+PRE_RE = re.compile(r'<pre>(.*?)</pre>', re.IGNORECASE | re.DOTALL)
+# A link and the text after it, up to the end of the line or the next link
+PRE_ROW_RE = re.compile(r'<a\s+href="([^"]*)"[^>]*>.*?</a>([^<\n]*(?:<(?!a\s)[^<\n]*)*)', re.IGNORECASE)
+TAG_RE = re.compile(r'<[^>]*>')
+
+def parse_pre_listing(text):
+    """
+    Parse the <pre> rows of an nginx or Apache (FancyIndexing without tables)
+    autoindex page with one line regex; None for any other layout.
+    """
+    title = TITLE_TAG_RE.search(text)
+    if not title or not AutoindexParser.TITLE_RE.match(unescape(title.group(1))):
+        return None
+    pre = PRE_RE.search(text)
+    if not pre:
+        return None
+    entries = []
+    for href, trailing in PRE_ROW_RE.findall(pre.group(1)):
+        href = unescape(href)
+        if is_listing_link(href):
+            if '<' in trailing:
+                trailing = TAG_RE.sub('', trailing)
+            entries.append(listing_entry(href, unescape(trailing)))
+    return entries or None
+
+class AutoindexParser(HTMLParser):
+    """
+    Parser for the HTML autoindex pages parse_pre_listing does not handle:
+    Apache's fancy table, python http.server and table based listings.
+
+    Size and modification time are picked up from the text following each
+    link, or from the data-order / <time datetime> attributes of table based
+    listings. recognized tells whether the page looked like a directory
+    listing at all.
+    """
+    TITLE_RE = re.compile(r'^\s*(Index of|Directory listing for)\b', re.IGNORECASE)
+
+    def __init__(self):
+        super().__init__()
+        self.entries = []
+        self.recognized = None   # None until </title> or the first link is seen
+        self._title = None
+        self._href = None        # link whose trailing text is being collected
+        self._in_anchor = False
+        self._trailing = []
+        self._size = None
+        self._mtime = None
+
+    def _decide(self):
+        if self.recognized is None:
+            self.recognized = bool(self._title and self.TITLE_RE.match(self._title))
+
+    def _flush(self):
+        if self._href is None:
+            return
+        self.entries.append(listing_entry(self._href, ''.join(self._trailing),
+                                          self._size, self._mtime))
+        self._href = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'title':
+            self._title = ''
+        elif tag == 'a':
+            self._decide()
+            href = dict(attrs).get('href')
+            if href and is_listing_link(href):
+                self._flush()
+                self._href = href
+                self._trailing, self._size, self._mtime = [], None, None
+                self._in_anchor = True
+        elif self._href is not None:
+            attrs = dict(attrs)
+            if tag == 'td' and attrs.get('data-order', '').isdigit():
+                self._size = int(attrs['data-order'])
+            elif tag == 'time' and attrs.get('datetime'):
+                self._mtime = parse_listing_date(attrs['datetime'])
+
+    def handle_endtag(self, tag):
+        if tag == 'title':
+            self._decide()
+        elif tag == 'a':
+            self._in_anchor = False
+        elif tag in ('tr', 'li', 'pre', 'table'):
+            self._flush()
+
+    def handle_data(self, data):
+        if self._title is not None and self.recognized is None:
+            self._title += data
+        elif self._href is not None and not self._in_anchor:
+            self._trailing.append(data)
+
+    def close(self):
+        super().close()
+        self._flush()
+        self._decide()
+        # Untitled layouts still count when their rows carried metadata
+        if not self.recognized and any(e.size is not None or e.mtime is not None
+                                       for e in self.entries):
+            self.recognized = True
+
+def json_entry(item):
+    """Turn one nginx or Caddy JSON listing element into an Entry"""
+    name = item.get('name', '')
+    is_dir = item.get('is_dir', item.get('type') == 'directory')
+    href = item.get('url') or quote(name)
+    if href.startswith('./'):
+        href = href[2:]
+    if is_dir and not href.endswith('/'):
+        href += '/'
+    mtime = item.get('mtime') or item.get('mod_time')
+    size = item.get('size')
+    return Entry(href, None if is_dir or not isinstance(size, int) else size,
+                 parse_listing_date(mtime) if mtime else None)
+
+def parse_listing(text, content_type=''):
+    """
+    Parse a directory listing page into Entry links. JSON listings are
+    decoded with json.loads and <pre> autoindex rows matched by
+    parse_pre_listing; other HTML goes through AutoindexParser, and a page
+    it does not recognise through BeautifulSoup (without size/mtime).
+    """
+    if 'json' in content_type:
+        return [e for e in map(json_entry, json.loads(text)) if is_listing_link(e.href)]
+    links = parse_pre_listing(text)
+    if links is not None:
+        return links
+    parser = AutoindexParser()
+    parser.feed(text)
+    parser.close()
+    if parser.recognized:
+        return parser.entries
+    soup = BeautifulSoup(text, 'html.parser')
+    return [Entry(link['href']) for link in soup.select('a[href]')
+            if is_listing_link(link['href'])]
+
+def parse_directory(session, url, validators=None, retry=None, metrics=None):
+    """
+    Parse directory listing and return a Listing of Entry links, or None if
+    the listing could not be fetched. With validators, an unchanged listing
+    (304) comes back with links set to None.
+
+    See parse_listing for the layouts understood. With metrics, the time
+    spent parsing (as opposed to waiting for the body) is recorded as the
+    'parse' phase.
+    """
+    retry = retry or RetryPolicy()
+    headers = {'Accept': 'text/html,application/json;q=0.9,*/*;q=0.8'}
+    headers.update(validators or {})
+    for _ in retry.attempts(url):
+        try:
+            with session.get(url, headers=headers, timeout=10) as response:
+                if response.status_code == 304:
+                    return Listing(None, None, None)
+                response.raise_for_status()
+                response.encoding = response.encoding or 'utf-8'
+                text = response.text
+                start = time.perf_counter()
+                links = parse_listing(text, response.headers.get('Content-Type', ''))
+                if metrics:
+                    metrics.add_time('parse', time.perf_counter() - start)
+                return Listing(links, response.headers.get('ETag'),
+                               response.headers.get('Last-Modified'))
+        except Exception as e:
+            print(f"  ✗ Directory parsing failed: {str(e)}")
+            if not retry.is_transient(e):
+                break
+    return None
+
+CHECKSUM_LISTS = ('SHA256SUMS', 'SHA256SUMS.txt', 'sha256sums.txt', 'sha256sum.txt')
+GNU_SUM_RE = re.compile(r'^([0-9a-fA-F]{64})\s+\*?(.+)$')
+BSD_SUM_RE = re.compile(r'^SHA256\s*\((.+)\)\s*=\s*([0-9a-fA-F]{64})$')
+
+def parse_checksums(text, default_name=None):
+    """
+    Parse sha256sum (GNU or BSD style) output into {file name: hex digest}.
+    A bare digest, as found in many 'file.sha256' files, is mapped to
+    default_name.
+    """
+    sums = {}
+    for line in text.splitlines():
+        line = line.strip()
+        m = GNU_SUM_RE.match(line)
+        if m:
+            digest, name = m.groups()
+        else:
+            m = BSD_SUM_RE.match(line)
+            if m:
+                name, digest = m.groups()
+            elif default_name and re.fullmatch(r'[0-9a-fA-F]{64}', line):
+                digest, name = line, default_name
+            else:
+                continue
+        sums[os.path.basename(name.strip())] = digest.lower()
+    return sums
+
+FICLONE = 0x40049409    # Linux ioctl: share extents between two files
+
+def reflink(src, dst):
+    """Copy-on-write clone of src at dst (btrfs, XFS, ...); raises OSError if unsupported"""
+    import fcntl
+    with open(src, 'rb') as s, open(dst, 'wb') as d:
+        fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+
+class DedupStore:
+    """
+    Content-addressed store of downloaded files, keyed by SHA-256.
+
+    Each distinct content is kept once under objects/ab/cdef..., and every
+    file of the output tree with that content becomes a hardlink (or reflink)
+    to it. The hash index lives in a small SQLite database next to the
+    objects, so one store can be shared by several mirrors. Linking falls
+    back to a plain copy across filesystems.
+
+    Download workers call into the store, so access is serialised by a lock.
+    """
+    def __init__(self, root, link_mode='hardlink'):
+        self.root = root
+        self.link_mode = link_mode
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(root, 'index.sqlite'), check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS objects ('
+                        'sha256 TEXT PRIMARY KEY, size INTEGER NOT NULL, added REAL NOT NULL)')
+
+    def object_path(self, digest):
+        return os.path.join(self.root, 'objects', digest[:2], digest[2:])
+
+    def has(self, digest, size=None):
+        """Whether content with this digest (and size, if given) is stored"""
+        with self._lock:
+            row = self.db.execute('SELECT size FROM objects WHERE sha256=?', (digest,)).fetchone()
+        return (row is not None and (size is None or row[0] == size) and
+                os.path.exists(self.object_path(digest)))
+
+    def _link(self, src, dst):
+        if self.link_mode == 'reflink':
+            try:
+                reflink(src, dst)
+                return
+            except (OSError, ImportError):
+                pass
+        else:
+            try:
+                os.link(src, dst)
+                return
+            except OSError:
+                pass
+        shutil.copyfile(src, dst)
+
+    def place(self, digest, local_path):
+        """Make local_path a link to the stored content, replacing any file there"""
+        tmp_path = local_path + '.link'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        self._link(self.object_path(digest), tmp_path)
+        os.replace(tmp_path, local_path)
+
+    def adopt(self, local_path, digest, size):
+        """
+        Add a freshly downloaded file to the store. Returns True when the
+        content was already known, in which case local_path now links to
+        the existing object and the downloaded copy is gone.
+        """
+        with self._lock:
+            known = self.db.execute('SELECT 1 FROM objects WHERE sha256=?', (digest,)).fetchone()
+            path = self.object_path(digest)
+            if known and os.path.exists(path):
+                self.place(digest, local_path)
+                return True
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if os.path.exists(path):
+                os.remove(path)
+            self._link(local_path, path)
+            self.db.execute('INSERT OR REPLACE INTO objects VALUES (?, ?, ?)',
+                            (digest, size, time.time()))
+            self.db.commit()
+            return False
+
+    def close(self):
+        self.db.close()
+
+class CrawlState:
+    """
+    On-disk crawl frontier, visited set and per-file status.
+
+    Everything lives in a SQLite database (WAL mode) so a crawl can be resumed
+    after an interruption and memory stays flat no matter how many URLs have
+    been seen. Only small batches of pending work are held in memory, and
+    writes are committed in batches rather than one transaction per URL.
+
+    Rows move through the statuses pending -> queued -> done/failed; 'queued'
+    rows were handed to the crawler but not finished, so a resumed run puts
+    them back to pending. backlog counts the unfinished (pending or queued)
+    rows of each table in memory, so progress reporting never scans them.
+
+    The manifest and listings tables outlive individual crawls: they keep the
+    ETag/Last-Modified validators of every downloaded file and directory
+    listing so --sync can ask the server for changes only.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE IF NOT EXISTS dirs (
+            id INTEGER PRIMARY KEY, url TEXT UNIQUE NOT NULL,
+            depth INTEGER NOT NULL, local_path TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending');
+        CREATE TABLE IF NOT EXISTS files (
+            id INTEGER PRIMARY KEY, url TEXT UNIQUE NOT NULL,
+            local_path TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            size INTEGER, mtime REAL, sha256 TEXT);
+        CREATE INDEX IF NOT EXISTS dirs_status ON dirs (status, id);
+        CREATE INDEX IF NOT EXISTS files_status ON files (status, id);
+        CREATE TABLE IF NOT EXISTS manifest (
+            url TEXT PRIMARY KEY, local_path TEXT NOT NULL,
+            etag TEXT, last_modified TEXT, size INTEGER);
+        CREATE TABLE IF NOT EXISTS listings (
+            url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT,
+            links TEXT NOT NULL);
+    """
+
+    def __init__(self, path, batch_size=500, commit_interval=2.0):
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(self.SCHEMA)
+        # Listing metadata columns were added after the first schema
+        columns = {row[1] for row in self.db.execute('PRAGMA table_info(files)')}
+        for column, kind in (('size', 'INTEGER'), ('mtime', 'REAL'), ('sha256', 'TEXT')):
+            if column not in columns:
+                self.db.execute(f'ALTER TABLE files ADD COLUMN {column} {kind}')
+        self.batch_size = batch_size
+        self.commit_interval = commit_interval
+        self._dirty = 0
+        self._last_commit = time.monotonic()
+        self._dirs = deque()
+        self._files = deque()
+        self.backlog = {'dirs': 0, 'files': 0}
+
+    def start(self, base_url, output, resume):
+        """Prepare the store for a new crawl, or for resuming the previous one"""
+        if resume:
+            row = self.db.execute("SELECT value FROM meta WHERE key='base_url'").fetchone()
+            if row and row[0] != base_url:
+                raise ValueError(f"saved crawl state is for {row[0]}, not {base_url}")
+            for table in ('dirs', 'files'):
+                self.db.execute(f"UPDATE {table} SET status='pending' "
+                                "WHERE status IN ('queued', 'failed')")
+                self.backlog[table] = self.counts(table).get('pending', 0)
+        else:
+            self.db.execute('DELETE FROM dirs')
+            self.db.execute('DELETE FROM files')
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES ('base_url', ?)", (base_url,))
+        self.add_dir(base_url, 0, output)
+        self.commit()
+
+    def counts(self, table):
+        """Return {status: count} for the dirs or files table"""
+        return dict(self.db.execute(f"SELECT status, COUNT(*) FROM {table} GROUP BY status"))
+
+    def add_dir(self, url, depth, local_path):
+        """Queue a directory; returns False if it was already seen"""
+        cur = self.db.execute(
+            'INSERT OR IGNORE INTO dirs (url, depth, local_path) VALUES (?, ?, ?)',
+            (url, depth, local_path))
+        self._dirty += 1
+        self.backlog['dirs'] += cur.rowcount
+        return cur.rowcount == 1
+
+    def add_file(self, url, local_path, status='pending', size=None, mtime=None, sha256=None):
+        """Record a file; returns False if it was already seen"""
+        cur = self.db.execute(
+            'INSERT OR IGNORE INTO files (url, local_path, status, size, mtime, sha256) '
+            'VALUES (?, ?, ?, ?, ?, ?)', (url, local_path, status, size, mtime, sha256))
+        self._dirty += 1
+        if status == 'pending':
+            self.backlog['files'] += cur.rowcount
+        return cur.rowcount == 1
+
+    def get_manifest(self, url):
+        """Return (etag, last_modified, size) recorded for a file, or None"""
+        return self.db.execute('SELECT etag, last_modified, size FROM manifest WHERE url=?',
+                               (url,)).fetchone()
+
+    def set_manifest(self, url, local_path, etag, last_modified, size):
+        self.db.execute('INSERT OR REPLACE INTO manifest VALUES (?, ?, ?, ?, ?)',
+                        (url, local_path, etag, last_modified, size))
+        self._dirty += 1
+
+    def get_listing(self, url):
+        """Return (etag, last_modified, links) of the last listing of url, or None"""
+        row = self.db.execute('SELECT etag, last_modified, links FROM listings WHERE url=?',
+                              (url,)).fetchone()
+        if not row:
+            return None
+        links = [Entry(*item) if isinstance(item, list) else Entry(item)
+                 for item in json.loads(row[2])]
+        return row[0], row[1], links
+
+    def set_listing(self, url, etag, last_modified, links):
+        self.db.execute('INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?)',
+                        (url, etag, last_modified, json.dumps(links)))
+        self._dirty += 1
+
+    def _fill(self, table, columns, buffer):
+        if not buffer:
+            rows = self.db.execute(
+                f"SELECT id, {columns} FROM {table} WHERE status='pending' "
+                "ORDER BY id LIMIT ?", (self.batch_size,)).fetchall()
+            self.db.executemany(f"UPDATE {table} SET status='queued' WHERE id=?",
+                                [(row[0],) for row in rows])
+            self._dirty += len(rows)
+            buffer.extend(rows)
+        return bool(buffer)
+
+    def has_dirs(self):
+        return self._fill('dirs', 'url, depth, local_path', self._dirs)
+
+    def has_files(self):
+        return self._fill('files', 'url, local_path, size, mtime, sha256', self._files)
+
+    def next_dir(self):
+        """Pop the next pending directory as (id, url, depth, local_path)"""
+        return self._dirs.popleft() if self.has_dirs() else None
+
+    def next_file(self):
+        """Pop the next pending file as (id, url, local_path, size, mtime, sha256)"""
+        return self._files.popleft() if self.has_files() else None
+
+    def finish(self, table, row_id, ok=True, status=None):
+        """Set the final status of a queued row"""
+        self.db.execute(f'UPDATE {table} SET status=? WHERE id=?',
+                        (status or ('done' if ok else 'failed'), row_id))
+        self.backlog[table] -= 1
+        self._dirty += 1
+        self.maybe_commit()
+
+    def maybe_commit(self):
+        """Commit once enough changes or time have accumulated"""
+        if (self._dirty >= self.batch_size or
+                time.monotonic() - self._last_commit >= self.commit_interval):
+            self.commit()
+
+    def commit(self):
+        self.db.commit()
+        self._dirty = 0
+        self._last_commit = time.monotonic()
+
+    def close(self):
+        self.commit()
+        self.db.close()
+
+class Crawler:
+    """
+    Breadth-first crawler that lists directories and downloads files
+    concurrently through a pool of workers.
+
+    Only the coordinating thread (run()) touches the crawl state; workers
+    just perform the HTTP requests.
+    """
+    def __init__(self, args, base_url, file_filter, state, store=None, metrics=None):
+        self.args = args
+        self.base_url = base_url
+        self.filter = file_filter
+        self.state = state
+        self.store = store
+        self.metrics = metrics or Metrics()
+        initial_rate = 1 / args.delay if args.delay > 0 else args.max_rate
+        self.limiter = AdaptiveLimiter(initial_rate, args.max_rate)
+        self.retry = RetryPolicy(args.retries, maximum=args.backoff_max, metrics=self.metrics)
+        # Segmented downloads open extra connections on top of the workers',
+        # but never more than --per-host allows
+        self.session = create_session(max(args.workers, min(args.workers * args.segments, args.per_host)),
+                                      self.limiter, self.metrics)
+        self.host_slots = HostSlots(args.per_host)
+        self.listings_in_flight = 0
+        self.interrupted = threading.Event()
+
+    def list_directory(self, url, validators):
+        """Worker task: fetch and parse one directory listing (plus its checksums)"""
+        with self.host_slots.slot(url), self.metrics.timed('listing'):
+            listing = parse_directory(self.session, url, validators, self.retry, self.metrics)
+            checksums = {}
+            if self.store and listing and listing.links:
+                checksums = self.fetch_checksums(url, listing.links)
+        return listing, checksums
+
+    def fetch_checksums(self, url, links):
+        """
+        Read the SHA256SUMS-style lists and 'file.sha256' files of a listing,
+        so content already in the dedup store can be linked without a transfer.
+        """
+        names = {unquote(entry.href) for entry in links}
+        sums = {}
+        for entry in links:
+            name = unquote(entry.href)
+            if name in CHECKSUM_LISTS:
+                target = None
+            elif name.endswith('.sha256') and name[:-7] in names:
+                target = name[:-7]
+                if not self.filter.allows_name(target):
+                    continue
+            else:
                 continue
-            # Skip special protocols
-            if any(href.startswith(p) for p in ['javascript:', 'mailto:', 'tel:']):
+            try:
+                response = self.session.get(urljoin(url, entry.href), timeout=10)
+                response.raise_for_status()
+            except Exception as e:
+                print(f"  ✗ Checksum fetch failed: {str(e)}")
                 continue
-            links.append(href)
-        return links
-    except Exception as e:
-        print(f"  ✗ Directory parsing failed: {str(e)}")
-        return []
+            sums.update(parse_checksums(response.text, target))
+        return sums
 
-def main():
-    args = create_arg_parser()
-    base_url = normalize_url(args.url)
-    extensions = [ext.strip() for ext in args.extension.split(',')]
-    
-    # Create output directory
-    os.makedirs(args.output, exist_ok=True)
-    
-    # BFS queue: (current_url, current_depth, local_path)
-    queue = deque([(base_url, 0, args.output)])
-    visited = set()
+    def fetch_file(self, url, local_path, validators, size=None, mtime=None, sha256=None):
+        """Worker task: download one file"""
+        if self.store and sha256 and self.store.has(sha256):
+            # Another copy finished since this file was queued
+            self.store.place(sha256, local_path)
+            return DownloadResult(True, size=size, sha256=sha256, deduped=True)
+        result = self.transfer(url, local_path, validators, size, mtime)
+        if self.store and result.ok and result.sha256:
+            if sha256 and sha256 != result.sha256:
+                print(f"  ! Checksum mismatch for {os.path.basename(local_path)}: "
+                      f"expected {sha256}, got {result.sha256}")
+            if self.store.adopt(local_path, result.sha256, result.size):
+                result = result._replace(deduped=True)
+        return result
 
-    print(f"Starting download from: {base_url}")
-    print(f"Target extensions: {', '.join(extensions)}")
-    print(f"Max depth: {args.depth}, Delay: {args.delay}s\n")
+    def transfer(self, url, local_path, validators, size, mtime):
+        """
+        Probe (if needed) and download one file, single stream or segmented.
+        Every request holds a host slot; a segmented download takes one per
+        range in flight instead of one for the whole file.
+        """
+        slot = self.host_slots.slot(url)
+        need_meta = self.filter.allows_meta(size, mtime) is None
+        want_segments = self.args.segments > 1 and (size is None or
+                                                     size >= self.args.segment_threshold)
+        probe = None
+        if need_meta or want_segments:
+            with slot, self.metrics.timed('probe'):
+                probe = probe_file(self.session, url, validators)
+            if probe is not None and probe.status_code == 304:
+                return DownloadResult(True, unchanged=True)
+        if need_meta:
+            # The listing lacked a column a filter needs: use the HEAD answer
+            size, mtime = probe_metadata(probe)
+            if self.filter.allows_meta(size, mtime) is False:
+                return DownloadResult(True, skipped=True)
+        with self.metrics.timed('download'):
+            if want_segments and supports_segments(probe, self.args.segment_threshold):
+                result = download_segmented(self.session, url, local_path, probe,
+                                            min(self.args.segments, self.args.per_host),
+                                            self.retry, self.args.drop_cache_above,
+                                            self.store is not None, self.on_write, slot)
+                if result is not None:
+                    return result
+            with slot:
+                return download_file(self.session, url, local_path, self.retry, validators,
+                                     self.args.drop_cache_above, self.store is not None,
+                                     self.on_write)
 
-    while queue:
-        url, depth, local_base = queue.popleft()
-        
-        if url in visited:
-            continue
-        visited.add(url)
-        
-        print(f"Processing: {url} [Depth {depth}]")
-        
-        # Parse directory contents
-        links = parse_directory(url)
+    def on_write(self, n):
+        """copy_stream callback: count the bytes, stop the transfer once interrupted"""
+        self.metrics.add_bytes(n)
+        if self.interrupted.is_set():
+            raise TransferInterrupted()
+
+    def file_validators(self, url, local_path):
+        """Conditional headers used to re-check an existing file in --sync mode"""
+        known = self.state.get_manifest(url)
+        if known and (known[0] or known[1]):
+            return conditional_headers(known[0], known[1])
+        # No manifest entry yet: fall back to the local modification time
+        return conditional_headers(last_modified=formatdate(os.path.getmtime(local_path),
+                                                            usegmt=True))
+
+    def handle_listing(self, url, depth, local_base, links, unchanged=False, checksums=None):
+        """
+        Queue subdirectories and matching files found in a listing. When the
+        listing itself is unchanged (--sync), files already in the manifest
+        are trusted without asking the server again. Files whose published
+        checksum is already in the dedup store are linked right away.
+        """
+        checksums = checksums or {}
         if not links:
-            print("  → No valid links found")
-            continue
-        
-        for link in links:
-            absolute_url = urljoin(url, link)
+            log(f"  → No valid links found in {url}")
+            return
+
+        for entry in links:
+            absolute_url = urljoin(url, entry.href)
+            # Never climb above the base URL (parent links, other sites)
+            if not absolute_url.startswith(self.base_url):
+                continue
+            relpath = unquote(absolute_url[len(self.base_url):])
             
             # Process directories
             if absolute_url.endswith('/'):
-                if depth < args.depth:
+                if depth < self.args.depth:
+                    if not self.filter.allows_dir(relpath):
+                        log(f"  - Pruned directory: {relpath}")
+                        continue
                     # Create local directory path
                     dir_name = os.path.basename(absolute_url.rstrip('/'))
                     new_local = os.path.join(local_base, dir_name)
                     os.makedirs(new_local, exist_ok=True)
                     
                     # Add to queue for processing
-                    queue.append((absolute_url, depth + 1, new_local))
-                    print(f"  + Queued directory: {dir_name}")
+                    if self.state.add_dir(absolute_url, depth + 1, new_local):
+                        log(f"  + Queued directory: {dir_name}")
             # Process files
             else:
                 filename = os.path.basename(absolute_url)
-                if is_valid_extension(filename, extensions):
+                if (self.filter.allows_name(relpath) and
+                        self.filter.allows_meta(entry.size, entry.mtime) is not False):
                     local_path = os.path.join(local_base, filename)
                     
-                    if os.path.exists(local_path):
-                        print(f"  ✓ Skipping existing: {filename}")
+                    sha256 = checksums.get(unquote(filename))
+                    if not os.path.exists(local_path):
+                        if sha256 and self.store.has(sha256, entry.size):
+                            self.store.place(sha256, local_path)
+                            log(f"  ⧉ Linked from store: {filename}")
+                            self.metrics.count('files_deduped')
+                            self.state.add_file(absolute_url, local_path, status='done',
+                                                size=entry.size, sha256=sha256)
+                            continue
+                        self.state.add_file(absolute_url, local_path, size=entry.size,
+                                            mtime=entry.mtime, sha256=sha256)
+                    elif not self.args.sync:
+                        log(f"  ✓ Skipping existing: {filename}")
+                        self.metrics.count('files_existing')
+                        self.state.add_file(absolute_url, local_path, status='done')
+                    elif unchanged and self.state.get_manifest(absolute_url):
+                        self.state.add_file(absolute_url, local_path, status='done')
                     else:
-                        print(f"  ↓ Downloading: {filename}")
-                        if download_file(absolute_url, local_path):
-                            print(f"    → Saved to: {local_path}")
-                        time.sleep(args.delay)
-        time.sleep(args.delay)
+                        # Re-check with a conditional request
+                        self.state.add_file(absolute_url, local_path, size=entry.size,
+                                            mtime=entry.mtime, sha256=sha256)
+
+    def submit_next(self, pool, pending):
+        """
+        Submit the next task, favouring directory listings so new work keeps
+        being discovered, without letting them starve the downloads.
+        """
+        listing_cap = max(1, self.args.workers // 2)
+        if self.state.has_dirs() and (not self.state.has_files() or
+                                      self.listings_in_flight < listing_cap):
+            row_id, url, depth, local_base = self.state.next_dir()
+            log(f"Processing: {url} [Depth {depth}]")
+            cached = self.state.get_listing(url) if self.args.sync else None
+            validators = conditional_headers(cached[0], cached[1]) if cached else None
+            future = pool.submit(self.list_directory, url, validators)
+            pending[future] = ('dirs', row_id, url, depth, local_base, cached)
+            self.listings_in_flight += 1
+            return True
+        while self.state.has_files():
+            row_id, url, local_path, size, mtime, sha256 = self.state.next_file()
+            validators = None
+            if os.path.exists(local_path):
+                if not self.args.sync:
+                    # Finished just before an interrupted run was stopped
+                    self.state.finish('files', row_id)
+                    continue
+                validators = self.file_validators(url, local_path)
+                log(f"  ? Checking: {os.path.basename(local_path)}")
+            else:
+                log(f"  ↓ Downloading: {os.path.basename(local_path)}")
+            future = pool.submit(self.fetch_file, url, local_path, validators, size, mtime, sha256)
+            pending[future] = ('files', row_id, url, local_path)
+            return True
+        return False
+
+    def finish_listing(self, task, result):
+        _, row_id, url, depth, local_base, cached = task
+        listing, checksums = result
+        if listing is None:
+            self.metrics.count('dirs_failed')
+            self.state.finish('dirs', row_id, ok=False)
+            return
+        self.metrics.count('dirs_done')
+        if listing.links is None:
+            # 304: replay the links stored with the previous listing
+            self.metrics.count('dirs_unchanged')
+            log(f"  ✓ Listing unchanged: {url}")
+            self.handle_listing(url, depth, local_base, cached[2], unchanged=True)
+        else:
+            self.state.set_listing(url, listing.etag, listing.last_modified, listing.links)
+            self.handle_listing(url, depth, local_base, listing.links, checksums=checksums)
+        self.state.finish('dirs', row_id)
+
+    def finish_file(self, task, result):
+        _, row_id, url, local_path = task
+        if result.skipped:
+            log(f"  - Filtered out: {os.path.basename(local_path)}")
+            self.metrics.count('files_skipped')
+            self.state.finish('files', row_id, status='skipped')
+            return
+        if result.unchanged:
+            log(f"  ✓ Unchanged: {os.path.basename(local_path)}")
+            self.metrics.count('files_unchanged')
+        elif result.ok:
+            self.metrics.count('files_done')
+            if result.deduped:
+                log(f"  ⧉ Linked from store: {local_path}")
+                self.metrics.count('files_deduped')
+            else:
+                log(f"    → Saved to: {local_path}")
+            self.state.set_manifest(url, local_path, result.etag,
+                                    result.last_modified, result.size)
+        else:
+            self.metrics.count('files_failed')
+        self.state.finish('files', row_id, result.ok)
+
+    def refresh_backlog(self):
+        """Hand the queue sizes to the metrics"""
+        self.metrics.set_backlog(self.state.backlog['dirs'], self.state.backlog['files'])
+
+    def run(self):
+        pending = {}
+        try:
+            with ThreadPoolExecutor(max_workers=self.args.workers) as pool:
+                try:
+                    while True:
+                        # Keep a small backlog per worker so nobody sits idle
+                        while len(pending) < self.args.workers * 2:
+                            if not self.submit_next(pool, pending):
+                                break
+                        if not pending:
+                            break
+
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            task = pending.pop(future)
+                            if task[0] == 'dirs':
+                                self.listings_in_flight -= 1
+                                self.finish_listing(task, future.result())
+                            else:
+                                self.finish_file(task, future.result())
+                        self.refresh_backlog()
+                except KeyboardInterrupt:
+                    # Drop the queued tasks and stop running transfers at their
+                    # next write; their .part files and queue rows are kept for --resume
+                    self.interrupted.set()
+                    for future in pending:
+                        future.cancel()
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    raise
+                self.refresh_backlog()
+        finally:
+            self.state.close()
+            self.session.close()
+            if self.store:
+                self.store.close()
+
+def main():
+    global VERBOSE
+    args = create_arg_parser()
+    VERBOSE = not args.quiet
+    base_url = normalize_url(args.url)
+    extensions = [ext.strip() for ext in args.extension.split(',')]
+    file_filter = FileFilter(extensions, args.min_size, args.max_size, args.newer_than,
+                             args.include, args.exclude)
+    
+    # Create output directory
+    os.makedirs(args.output, exist_ok=True)
+
+    state = CrawlState(args.state or os.path.join(args.output, '.rwdl-state.sqlite'))
+    try:
+        state.start(base_url, args.output, args.resume)
+    except ValueError as e:
+        state.close()
+        print(f"Cannot resume: {e}")
+        sys.exit(1)
+
+    print(f"Starting download from: {base_url}")
+    print(f"Target extensions: {', '.join(extensions)}")
+    print(f"Max depth: {args.depth}, Delay: {args.delay}s (adaptive, max {args.max_rate:g} req/s per host)")
+    if file_filter.needs_size or file_filter.needs_mtime or args.include or args.exclude:
+        print("Filters: " + ', '.join(
+            f"{name} {value}" for name, value in (
+                ('min-size', args.min_size), ('max-size', args.max_size),
+                ('newer-than', args.newer_than and formatdate(args.newer_than, usegmt=True)),
+                ('include', args.include), ('exclude', args.exclude)) if value))
+    print(f"Workers: {args.workers}, Per-host connections: {args.per_host}")
+    if args.sync:
+        print("Sync mode: re-checking existing files for upstream changes")
+    if args.resume:
+        dirs, files = state.counts('dirs'), state.counts('files')
+        print(f"Resuming: {dirs.get('pending', 0)} directories and "
+              f"{files.get('pending', 0)} files pending, "
+              f"{files.get('done', 0)} files already done")
+
+    metrics = Metrics()
+    try:
+        reporter = StatsReporter(metrics, args.stats_file, args.stats_interval,
+                                 args.metrics_port).start()
+    except OSError as e:
+        state.close()
+        print(f"Cannot serve metrics on port {args.metrics_port}: {e}")
+        sys.exit(1)
+    if args.metrics_port is not None:
+        print(f"Metrics: http://127.0.0.1:{args.metrics_port}/metrics")
+    print()
+
+    store = DedupStore(args.dedup_store, args.dedup_link) if args.dedup_store else None
+    try:
+        Crawler(args, base_url, file_filter, state, store, metrics).run()
+    except KeyboardInterrupt:
+        print("\nInterrupted; run again with --resume to continue")
+        sys.exit(130)
+    finally:
+        reporter.stop()
+        print_summary(metrics)
 
     print("\nDownload process completed!")
 
 if __name__ == "__main__":
-    HEADERS = {
-        # Custom headers to mimic a browser request
-        'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:125.0) Gecko/20100101 Firefox/125.0'
-    }
     main()
+
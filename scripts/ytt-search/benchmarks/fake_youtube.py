@@ -0,0 +1,251 @@
+################################################
+# YTTS - local stand-ins for the YouTube APIs
+# Copyright (c) 2025 angeldev0
+# License: MIT
+################################################
+"""
+Offline fakes for the two services yttrsch.py talks to, serving one
+synthetic channel:
+
+  • googleapiclient: channels/playlistItems/videos/search list() calls
+  • youtube_transcript_api: YouTubeTranscriptApi().fetch() (the 1.x API)
+
+Transcripts are generated from a fixed vocabulary with the keyword planted
+in a given fraction of segments. Latency, transient errors and videos
+without a transcript can be configured, and every call is counted.
+
+Run yttrsch.py against the fakes (everything after -- is passed to it):
+
+    python benchmarks/fake_youtube.py --videos 200 --latency 0.05 -- -k needle -c @bench
+"""
+
+import os
+import sys
+import json
+import time
+import types
+import random
+import argparse
+import threading
+from collections import Counter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CHANNEL_ID = 'UCbenchmarkchannel0000000'
+KEYWORD = 'needle'
+POOL = 64   # distinct transcripts, reused round-robin across videos
+
+class Channel:
+    """
+    A synthetic channel of videos transcripts, each of segments captions of
+    6-12 words; density is the fraction of captions containing keyword.
+    Videos whose index falls in no_transcript_rate have no transcript.
+    """
+    def __init__(self, videos=500, segments=400, density=0.01, keyword=KEYWORD,
+                 no_transcript_rate=0.0, seed=1):
+        self.keyword = keyword
+        rng = random.Random(seed)
+        self.ids = [f'v{seed:02d}{i:08d}'[-11:] for i in range(videos)]   # newest first
+        missing = set(rng.sample(range(videos), int(videos * no_transcript_rate)))
+        self.missing = {self.ids[i] for i in missing}
+        self.index = {vid: i for i, vid in enumerate(self.ids)}
+        vocabulary = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(2, 9)))
+                      for _ in range(3000)]
+        self.pool = []
+        for _ in range(POOL):
+            transcript = []
+            for s in range(segments):
+                words = rng.choices(vocabulary, k=rng.randint(6, 12))
+                if rng.random() < density:
+                    words[rng.randrange(len(words))] = keyword
+                transcript.append({'text': ' '.join(words), 'start': s * 3.0, 'duration': 3.0})
+            self.pool.append(transcript)
+
+    def transcript(self, video_id):
+        return self.pool[self.index[video_id] % POOL]
+
+    def metadata(self, video_id):
+        i = self.index[video_id]
+        return {
+            'id': video_id,
+            'snippet': {'title': f'Benchmark video {i}', 'channelId': CHANNEL_ID,
+                        'channelTitle': 'Benchmark', 'publishedAt': '2025-01-01T00:00:00Z'},
+            'contentDetails': {'duration': f'PT{5 + i % 55}M'},
+            'statistics': {'viewCount': str((i * 7919) % 100000)},
+        }
+
+class Fakes:
+    """Builds the fake modules for one channel and counts the calls made to them"""
+    def __init__(self, channel, latency=0.0, api_latency=0.0, error_rate=0.0):
+        self.channel = channel
+        self.latency = latency
+        self.api_latency = api_latency
+        self.error_rate = error_rate
+        self.calls = Counter()
+        self.lock = threading.Lock()
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.calls[name] += n
+
+    # --- youtube_transcript_api ---------------------------------------
+
+    def transcript_modules(self):
+        errors = types.ModuleType('youtube_transcript_api._errors')
+        for name in ('TranscriptsDisabled', 'NoTranscriptFound', 'VideoUnavailable'):
+            setattr(errors, name, type(name, (Exception,), {}))
+        fakes = self
+
+        class FetchedTranscript:
+            def __init__(self, segments):
+                self.segments = segments
+
+            def to_raw_data(self):
+                return list(self.segments)
+
+        class YouTubeTranscriptApi:
+            def fetch(self, video_id, languages=('en',)):
+                fakes.count('transcript')
+                time.sleep(fakes.latency)
+                attempt = fakes.calls[f'attempt:{video_id}']
+                fakes.count(f'attempt:{video_id}')
+                if fakes.error_rate and random.Random(f'{video_id}:{attempt}').random() < fakes.error_rate:
+                    fakes.count('transient_error')
+                    raise ConnectionError('synthetic transient error')
+                if video_id not in fakes.channel.index:
+                    raise errors.VideoUnavailable(video_id)
+                if video_id in fakes.channel.missing:
+                    raise errors.NoTranscriptFound(video_id)
+                segments = fakes.channel.transcript(video_id)
+                fakes.count('segments', len(segments))
+                return FetchedTranscript(segments)
+
+        package = types.ModuleType('youtube_transcript_api')
+        package.YouTubeTranscriptApi = YouTubeTranscriptApi
+        package._errors = errors
+        return {'youtube_transcript_api': package, 'youtube_transcript_api._errors': errors}
+
+    # --- googleapiclient ----------------------------------------------
+
+    def execute(self, resource, params):
+        self.count(f'api:{resource}')
+        time.sleep(self.api_latency)
+        channel = self.channel
+        if resource == 'channels':
+            if 'id' in params:
+                return {'items': [{'id': params['id'], 'contentDetails': {
+                    'relatedPlaylists': {'uploads': 'UU' + CHANNEL_ID[2:]}}}]}
+            return {'items': [{'id': CHANNEL_ID}]}
+        if resource == 'search':
+            return {'items': [{'id': {'channelId': CHANNEL_ID}}]}
+        if resource == 'playlistItems':
+            start = int(params.get('pageToken') or 0)
+            size = params.get('maxResults', 5)
+            page = {'items': [{'contentDetails': {'videoId': vid}}
+                              for vid in channel.ids[start:start + size]]}
+            if start + size < len(channel.ids):
+                page['nextPageToken'] = str(start + size)
+            return page
+        if resource == 'videos':
+            return {'items': [channel.metadata(vid) for vid in params['id'].split(',')
+                              if vid in channel.index]}
+        raise ValueError(f'unsupported resource: {resource}')
+
+    def api_modules(self):
+        fakes = self
+
+        class Request:
+            def __init__(self, resource, params):
+                self.resource, self.params = resource, params
+
+            def execute(self):
+                return fakes.execute(self.resource, self.params)
+
+        class Resource:
+            def __init__(self, name):
+                self.name = name
+
+            def list(self, **params):
+                return Request(self.name, {k: v for k, v in params.items() if v is not None})
+
+        class Client:
+            def __getattr__(self, name):
+                return lambda: Resource(name)
+
+        discovery = types.ModuleType('googleapiclient.discovery')
+        discovery.build = lambda *args, **kwargs: Client()
+        discovery.build_from_document = lambda *args, **kwargs: Client()
+        discovery_cache = types.ModuleType('googleapiclient.discovery_cache')
+        discovery_cache.get_static_doc = lambda name, version: json.dumps({'resources': {
+            name: {'methods': {'list': {}}} for name in ('channels', 'playlistItems', 'search', 'videos')}})
+        errors = types.ModuleType('googleapiclient.errors')
+        errors.HttpError = type('HttpError', (Exception,), {})
+        package = types.ModuleType('googleapiclient')
+        package.discovery, package.discovery_cache, package.errors = discovery, discovery_cache, errors
+        return {'googleapiclient': package, 'googleapiclient.discovery': discovery,
+                'googleapiclient.discovery_cache': discovery_cache, 'googleapiclient.errors': errors}
+
+    def install(self):
+        """Put the fakes in sys.modules so yttrsch's lazy imports pick them up"""
+        sys.modules.update(self.transcript_modules())
+        sys.modules.update(self.api_modules())
+
+    def stats(self):
+        calls = {k: v for k, v in self.calls.items() if not k.startswith('attempt:')}
+        calls['api'] = sum(v for k, v in calls.items() if k.startswith('api:'))
+        return calls
+
+def add_channel_arguments(parser):
+    parser.add_argument('--videos', type=int, default=500, help='Videos in the channel (default: 500)')
+    parser.add_argument('--segments', type=int, default=400,
+                        help='Captions per transcript (default: 400)')
+    parser.add_argument('--density', type=float, default=0.01,
+                        help=f'Fraction of captions containing "{KEYWORD}" (default: 0.01)')
+    parser.add_argument('--no-transcript-rate', type=float, default=0.05,
+                        help='Fraction of videos without a transcript (default: 0.05)')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Seconds per transcript request (default: 0)')
+    parser.add_argument('--api-latency', type=float, default=0.0,
+                        help='Seconds per Data API request (default: 0)')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Chance of a transient error per transcript request (default: 0)')
+    parser.add_argument('--seed', type=int, default=1, help='Generator seed (default: 1)')
+
+def fakes_from_args(args):
+    channel = Channel(args.videos, args.segments, args.density,
+                      no_transcript_rate=args.no_transcript_rate, seed=args.seed)
+    return Fakes(channel, args.latency, args.api_latency, args.error_rate)
+
+def main():
+    argv = sys.argv[1:]
+    split = argv.index('--') if '--' in argv else len(argv)
+    parser = argparse.ArgumentParser(description='Run yttrsch.py against local YouTube fakes')
+    add_channel_arguments(parser)
+    parser.add_argument('--stats', help='Write call counts, matches and timings to this JSON file')
+    args = parser.parse_args(argv[:split])
+
+    fakes = fakes_from_args(args)
+    fakes.install()
+    os.environ.setdefault('YOUTUBE_API_KEY', 'benchmark')
+    sys.path.insert(0, os.path.join(HERE, '..'))
+    import yttrsch
+
+    printed = Counter()
+    print_matches = yttrsch.print_matches
+
+    def counting_print_matches(title, matches, *args):
+        printed['videos_matched'] += 1
+        printed['matches'] += len(matches)
+        print_matches(title, matches, *args)
+
+    yttrsch.print_matches = counting_print_matches
+    sys.argv = ['yttrsch.py'] + argv[split + 1:]
+    start = time.perf_counter()
+    yttrsch.main()
+    elapsed = time.perf_counter() - start
+
+    if args.stats:
+        with open(args.stats, 'w') as f:
+            json.dump(dict(fakes.stats(), seconds=elapsed, **printed), f)
+
+if __name__ == '__main__':
+    main()
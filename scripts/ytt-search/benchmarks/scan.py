@@ -0,0 +1,106 @@
+################################################
+# YTTS - scan benchmark
+# Copyright (c) 2025 angeldev0
+# License: MIT
+################################################
+"""
+End-to-end keyword search benchmark against the local YouTube fakes
+(benchmarks/fake_youtube.py), so it runs offline, without an API key, and
+is repeatable.
+
+Every variant runs a channel search (-k needle -c @bench plus the variant's
+arguments) as a child process with a fresh cache, and reports videos/s,
+transcript segments searched per second, matches, Data API calls and
+transcript requests per video, CPU time and peak RSS.
+
+    python benchmarks/scan.py --videos 1000 --segments 600 --latency 0.05 \\
+        --variant "serial=-j 1" --variant "parallel=-j 16"
+"""
+
+import os
+import sys
+import json
+import time
+import shlex
+import argparse
+import tempfile
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+import fake_youtube
+
+FAKE = os.path.join(HERE, 'fake_youtube.py')
+DEFAULT_VARIANTS = ['serial=-j 1', 'parallel=-j 8', 'unordered=-j 8 --unordered']
+BASE_ARGS = ['-k', f'{fake_youtube.KEYWORD},absentword', '-c', '@bench', '--retries', '1']
+
+def channel_args(args):
+    return ['--videos', str(args.videos), '--segments', str(args.segments),
+            '--density', str(args.density), '--no-transcript-rate', str(args.no_transcript_rate),
+            '--latency', str(args.latency), '--api-latency', str(args.api_latency),
+            '--error-rate', str(args.error_rate), '--seed', str(args.seed)]
+
+def run_variant(args, extra_args, quiet):
+    """Run one search in a child process; returns its timings and call counts"""
+    with tempfile.TemporaryDirectory(prefix='ytts-bench-') as tmp:
+        stats_path = os.path.join(tmp, 'stats.json')
+        env = dict(os.environ, XDG_CACHE_HOME=os.path.join(tmp, 'cache'),
+                   XDG_DATA_HOME=os.path.join(tmp, 'data'))
+        command = ([sys.executable, FAKE] + channel_args(args) + ['--stats', stats_path, '--']
+                   + BASE_ARGS + extra_args)
+        start = time.perf_counter()
+        child = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL if quiet else None)
+        _, status, usage = os.wait4(child.pid, 0)
+        elapsed = time.perf_counter() - start
+        stats = {}
+        if os.path.exists(stats_path):
+            with open(stats_path) as f:
+                stats = json.load(f)
+    return dict(stats,
+                exit=os.waitstatus_to_exitcode(status),
+                wall=elapsed,
+                cpu=usage.ru_utime + usage.ru_stime,
+                peak_rss_mb=usage.ru_maxrss / 1024)   # KiB on Linux
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ytt-search against local YouTube fakes')
+    fake_youtube.add_channel_arguments(parser)
+    parser.add_argument('--variant', action='append',
+                        help='NAME=YTTRSCH_ARGS to benchmark; repeatable '
+                             f'(default: {" / ".join(DEFAULT_VARIANTS)})')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per variant (default: 1)')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    parser.add_argument('--verbose', action='store_true', help="Show yttrsch's own output")
+    args = parser.parse_args()
+
+    print(f"Channel: {args.videos} videos x {args.segments} captions, keyword density "
+          f"{args.density:g}, transcript latency {args.latency * 1000:g} ms, "
+          f"API latency {args.api_latency * 1000:g} ms, error rate {args.error_rate:g}")
+    print(f"{'variant':<14} {'videos/s':>9} {'segs/s':>10} {'matches':>8} {'API/video':>10} "
+          f"{'fetch/video':>12} {'scan s':>7} {'cpu s':>7} {'peak RSS':>9}")
+    report = {'channel': vars(args), 'variants': {}}
+    for variant in args.variant or DEFAULT_VARIANTS:
+        name, _, extra = variant.partition('=')
+        runs = []
+        for _ in range(args.repeat):
+            result = run_variant(args, shlex.split(extra), not args.verbose)
+            runs.append(result)
+            if result['exit'] != 0 or 'seconds' not in result:
+                print(f"  ! {name}: exit {result['exit']}")
+        report['variants'][name] = {'args': extra, 'runs': runs}
+        runs = [r for r in runs if 'seconds' in r]
+        if not runs:
+            continue
+        best = min(runs, key=lambda r: r['seconds'])
+        seconds = best['seconds']
+        print(f"{name:<14} {args.videos / seconds:>9.1f} {best.get('segments', 0) / seconds:>10.0f} "
+              f"{best.get('matches', 0):>8} {best.get('api', 0) / args.videos:>10.3f} "
+              f"{best.get('transcript', 0) / args.videos:>12.2f} {seconds:>7.2f} "
+              f"{best['cpu']:>7.2f} {best['peak_rss_mb']:>7.1f}MB")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+################################################
+# YTTS - start-up benchmark
+# Copyright (c) 2025 angeldev0
+# License: MIT
+################################################
+"""
+Measure how long yttrsch.py takes from a cold interpreter to its output for
+the invocations that are typically scripted in loops. Everything they need
+(a cached transcript and title, an offline index) is prepared in a temporary
+cache, so nothing touches the network and the numbers are start-up cost.
+
+For reference the script also times a bare interpreter and the imports that
+yttrsch.py now defers (googleapiclient, youtube_transcript_api, isodate) plus
+building the Data API client from the bundled discovery document.
+
+    python benchmarks/startup.py --repeat 20
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(HERE, '..', 'yttrsch.py')
+sys.path.insert(0, os.path.join(HERE, '..'))
+import yttrsch
+
+VIDEO = 'dQw4w9WgXcQ'
+SEGMENTS = [{'text': f'line {i} about startup time', 'start': i * 2.0, 'duration': 2.0}
+            for i in range(600)]
+
+EAGER = ("import googleapiclient.discovery, youtube_transcript_api, isodate; "
+         "googleapiclient.discovery.build('youtube', 'v3', developerKey='x')")
+
+def prepare(tmp):
+    """Fill a cache and an index so the measured commands run offline"""
+    cache_dir = os.path.join(tmp, 'cache', 'ytt-search')
+    cache = yttrsch.TranscriptCache(cache_dir)
+    cache.put(VIDEO, 'en', SEGMENTS)
+    cache.close()
+    meta = yttrsch.MetadataCache(cache_dir)
+    meta.put_many({VIDEO: {'title': 'Startup benchmark', 'duration': None, 'source': 'oembed'}})
+    meta.close()
+    db = yttrsch.TranscriptIndex(os.path.join(tmp, 'data', 'ytt-search', 'index.sqlite'))
+    db.add(VIDEO, 'Startup benchmark', SEGMENTS)
+    db.close()
+
+def measure(cmd, env, repeat):
+    """Wall times in ms of repeat runs of cmd, after one warm-up run"""
+    subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL, check=True)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL, check=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark yttrsch.py start-up time')
+    parser.add_argument('--repeat', type=int, default=10, help='Runs per command (default: 10)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, XDG_CACHE_HOME=os.path.join(tmp, 'cache'),
+                   XDG_DATA_HOME=os.path.join(tmp, 'data'), YOUTUBE_API_KEY='')
+        prepare(tmp)
+        py = sys.executable
+        commands = (
+            ('python -c pass', [py, '-c', 'pass']),
+            ('eager imports', [py, '-c', EAGER]),
+            ('-V', [py, SCRIPT, '-V']),
+            ('-v search', [py, SCRIPT, '-k', 'startup', '-v',
+                           f'https://www.youtube.com/watch?v={VIDEO}']),
+            ('query', [py, SCRIPT, 'query', 'startup']),
+        )
+        print(f"{'command':<16} {'min ms':>8} {'median ms':>10}")
+        for name, cmd in commands:
+            times = measure(cmd, env, args.repeat)
+            print(f"{name:<16} {min(times):>8.1f} {statistics.median(times):>10.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -9,13 +9,22 @@ import argparse
 import os
 import re
 import sys
-# import time
-import isodate
-from urllib.parse import urlparse
+import time
+import json
+import zlib
+import random
+import sqlite3
+import threading
+from bisect import bisect_left, bisect_right
+from functools import partial
+from collections import namedtuple
+from contextlib import redirect_stdout
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse, quote
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
-from youtube_transcript_api import YouTubeTranscriptApi
-from youtube_transcript_api._errors import TranscriptsDisabled, NoTranscriptFound
-from googleapiclient.discovery import build
+# youtube_transcript_api, googleapiclient, isodate and urllib.request take
+# most of the start-up time and are imported where they are first needed
 
 BLUE      = '\033[94m'
 YELLOW    = '\033[93m'
@@ -58,48 +67,157 @@ def extract_video_id(url):
     m = re.search(r'(?:v=|\/)([0-9A-Za-z_-]{11})(?:\&|$)', url)
     return m.group(1) if m else None
 
-def parse_channel_input(youtube, raw):
+# Data API units per list() call; everything else used here costs 1
+QUOTA_COSTS = {'search': 100}
+
+class QuotaExceeded(Exception):
+    pass
+
+def quota_day():
+    """Data API quotas reset at midnight Pacific time."""
+    try:
+        from zoneinfo import ZoneInfo
+        tz = ZoneInfo("America/Los_Angeles")
+    except Exception:
+        tz = timezone(timedelta(hours=-8))
+    return datetime.now(tz).strftime('%Y-%m-%d')
+
+DISCOVERY_URL = "https://youtube.googleapis.com/$discovery/rest?version=v3"
+API_RESOURCES = ('channels', 'playlistItems', 'search', 'videos')
+
+def load_discovery_document(cache_dir=None):
+    """
+    The YouTube Data API discovery document, trimmed to the list() methods
+    used here. It is taken from google-api-python-client's bundled copy
+    (or downloaded once with older versions) and kept in cache_dir, so
+    building the client never needs the network.
+    """
+    path = os.path.join(cache_dir, 'youtube.v3.discovery.json') if cache_dir else None
+    if path and os.path.isfile(path):
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+    try:
+        from googleapiclient.discovery_cache import get_static_doc
+        doc = get_static_doc('youtube', 'v3')
+    except ImportError:
+        doc = None
+    if doc is None:
+        from urllib.request import urlopen
+        with urlopen(DISCOVERY_URL, timeout=30) as resp:
+            doc = resp.read().decode('utf-8')
+    doc = json.loads(doc)
+    doc['resources'] = {name: {'methods': {'list': doc['resources'][name]['methods']['list']}}
+                        for name in API_RESOURCES}
+    doc = json.dumps(doc)
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(doc)
+        os.replace(path + '.tmp', path)
+    return doc
+
+class YouTubeAPI:
+    """
+    All Data API requests go through list(), which meters their quota cost.
+    With a budget, a request that would take the day's usage past it raises
+    QuotaExceeded instead; with state (a MetadataCache) the day's usage is
+    shared between runs. The client itself is only built (from the cached
+    discovery document) on the first request.
+    """
+    def __init__(self, api_key, budget=None, state=None, cache_dir=None):
+        self.api_key = api_key
+        self.budget = budget
+        self.state = state
+        self.cache_dir = cache_dir
+        self.lock = threading.Lock()
+        self._client = None
+        self.exhausted = False
+        self.used = 0
+        self.day = quota_day()
+        self.used_before = state.get_quota(self.day) if state else 0
+
+    @property
+    def used_today(self):
+        return self.used_before + self.used
+
+    @property
+    def client(self):
+        with self.lock:
+            if self._client is None:
+                from googleapiclient.discovery import build_from_document
+                self._client = build_from_document(load_discovery_document(self.cache_dir),
+                                                   developerKey=self.api_key)
+            return self._client
+
+    def list(self, resource, **params):
+        cost = QUOTA_COSTS.get(resource, 1)
+        with self.lock:
+            if self.budget is not None and self.used_today + cost > self.budget:
+                self.exhausted = True
+                raise QuotaExceeded(f"Quota budget of {self.budget} units reached")
+            self.used += cost
+            if self.state:
+                self.state.add_quota(self.day, cost)
+        client = self.client
+        from googleapiclient.errors import HttpError
+        try:
+            return getattr(client, resource)().list(**params).execute()
+        except HttpError as e:
+            if e.resp.status == 403 and b'uotaExceeded' in (e.content or b''):
+                self.exhausted = True
+                raise QuotaExceeded("YouTube Data API quota exceeded") from e
+            raise
+
+def parse_channel_input(youtube, raw, state=None):
     """
     Accepts:
       • raw channel ID (UC…)
       • bare handle (@name)
       • full channel URL or @handle URL
-    and returns the proper UC… ID.
+    and returns the proper UC… ID. Handles resolved before are looked up
+    in state (a MetadataCache) instead of the API.
     """
     # bare handle
     if raw.startswith("@"):
-        return resolve_handle(youtube, raw[1:])
+        return resolve_handle(youtube, raw[1:], state)
     if raw.startswith("http"):
         p = urlparse(raw)
         parts = p.path.strip("/").split("/")
         # /@handle
         if parts[0].startswith("@"):
-            return resolve_handle(youtube, parts[0][1:])
+            return resolve_handle(youtube, parts[0][1:], state)
         # /channel/UC
         if parts[0] == "channel" and len(parts) > 1:
             return parts[1]
         # fallback path
-        return resolve_handle(youtube, parts[-1])
+        return resolve_handle(youtube, parts[-1], state)
     # assume it's an ID
     return raw
 
-def resolve_handle(youtube, name):
+def resolve_handle(youtube, name, state=None):
     """
-    Try channels().list(forUsername=…) then search().list(type=channel, q=…)
+    Try channels().list(forHandle=…), then forUsername=…, then
+    search().list(type=channel, q=…), remembering the answer in state.
     """
-    # old username
-    res = youtube.channels().list(part="id", forUsername=name).execute()
-    items = res.get("items", [])
-    if items:
-        return items[0]["id"]
-    # fallback search
-    res = youtube.search().list(
-        part="id", type="channel", q=name, maxResults=1
-    ).execute()
-    items = res.get("items", [])
-    if items:
-        return items[0]["id"]["channelId"]
-    raise ValueError(f"Cannot resolve channel identifier: {name}")
+    cid = state.get_handle(name) if state else None
+    if cid:
+        return cid
+    for key in ("forHandle", "forUsername"):
+        res = youtube.list("channels", part="id", **{key: name})
+        items = res.get("items", [])
+        if items:
+            cid = items[0]["id"]
+            break
+    else:
+        # fallback search
+        res = youtube.list("search", part="id", type="channel", q=name, maxResults=1)
+        items = res.get("items", [])
+        if not items:
+            raise ValueError(f"Cannot resolve channel identifier: {name}")
+        cid = items[0]["id"]["channelId"]
+    if state:
+        state.put_handle(name, cid)
+    return cid
 
 def parse_max_videos(val):
     """Parse human-friendly video count (e.g. 1.3k, 2m) into integer."""
@@ -110,70 +228,527 @@ def parse_max_videos(val):
         return int(float(v[:-1]) * 1_000_000)
     return int(v)
 
-def get_video_ids_from_channel(youtube, channel_id, sort_order='newest', max_videos=None):
+def uploads_playlist_id(youtube, channel_id):
+    """The playlist holding every upload of a channel (UC… -> UU…)."""
+    if channel_id.startswith("UC"):
+        return "UU" + channel_id[2:]
+    res = youtube.list("channels", part="contentDetails", id=channel_id)
+    items = res.get("items", [])
+    if not items:
+        raise ValueError(f"Unknown channel: {channel_id}")
+    return items[0]["contentDetails"]["relatedPlaylists"]["uploads"]
+
+def iter_uploads(youtube, playlist_id, token=None):
     """
-    Fetch video IDs from a channel with optional sort and limit.
-    sort_order: 'newest', 'oldest', or 'popular'
-    max_videos: int or None
+    Yield (video_ids, next_token) for each page of an uploads playlist,
+    newest first, starting at token; next_token is None on the last page.
     """
-    ids = []
-    # API order param
-    order_param = 'viewCount' if sort_order == 'popular' else 'date'
-    req = youtube.search().list(
-        part="id", channelId=channel_id,
-        maxResults=50, type="video",
-        order=order_param
-    )
     while True:
-        res = req.execute()
-        batch = [item['id']['videoId'] for item in res.get('items', [])]
-        ids.extend(batch)
-        if max_videos and len(ids) >= max_videos:
-            ids = ids[:max_videos]
-            break
+        res = youtube.list("playlistItems", part="contentDetails", playlistId=playlist_id,
+                           maxResults=50, pageToken=token)
         token = res.get('nextPageToken')
+        yield [item['contentDetails']['videoId'] for item in res.get('items', [])], token
         if not token:
-            break
-        req = youtube.search().list(
-            part="id", channelId=channel_id,
-            maxResults=50, pageToken=token,
-            type="video", order=order_param
-        )
-    if sort_order == 'oldest':
-        ids.reverse()
-    return ids
+            return
 
-def fetch_transcription_segments(video_id):
+def get_video_ids_from_channel(youtube, channel_id, sort_order='newest', max_videos=None, state=None):
+    """
+    Fetch video IDs from a channel with optional sort and limit.
+    sort_order: 'newest', 'oldest', or 'popular'
+    max_videos: int or None
+
+    Videos come from the channel's uploads playlist. With state (a
+    MetadataCache) the listing is stored, and later runs only list the
+    uploads newer than the newest stored one; the full listing is
+    refreshed once older than the state's ttl. A listing cut short (by -m
+    or the quota budget) keeps its page token, and a later run that needs
+    more videos continues from there.
+    """
+    enough = lambda ids: sort_order == 'newest' and max_videos and len(ids) >= max_videos
+    playlist = uploads_playlist_id(youtube, channel_id)
+    stored, token = state.get_uploads(channel_id) if state else (None, None)
+    ids = list(stored or [])
+    listed = stored is not None
     try:
-        return YouTubeTranscriptApi.get_transcript(video_id), None
-    except (TranscriptsDisabled, NoTranscriptFound) as e:
-        return None, f"[{video_id}] no transcript: {e}"
-    except Exception as e:
-        return None, f"[{video_id}] error: {e}"
+        if stored is not None:
+            known = set(stored)
+            new = []
+            for page, _ in iter_uploads(youtube, playlist):
+                fresh = [vid for vid in page if vid not in known]
+                new += fresh
+                if len(fresh) < len(page):
+                    break
+            ids = new + stored
+        if stored is None or (token and not enough(ids)):
+            for page, token in iter_uploads(youtube, playlist, token):
+                ids += page
+                listed = True
+                if token and enough(ids):
+                    break
+    except QuotaExceeded as e:
+        print(f"{e}: continuing with the {len(ids)} channel videos listed so far; "
+              "run again after the quota resets to list the rest.")
+    ids = list(dict.fromkeys(ids))
+    if state and listed:
+        state.put_uploads(channel_id, ids, token, full=stored is None)
+
+    if sort_order == 'oldest':
+        ids = ids[::-1]
+    elif sort_order == 'popular':
+        metadata = fetch_video_metadata(youtube, ids, state)
+        ids = sorted(ids, key=lambda vid: metadata.get(vid, {}).get('views') or 0, reverse=True)
+    return ids[:max_videos] if max_videos else ids
+
+def transient_transcript_errors():
+    """Errors worth retrying: network failures and YouTube throttling/blocking"""
+    import requests
+    from youtube_transcript_api import _errors
+    # TooManyRequests before youtube-transcript-api 1.0, RequestBlocked/IpBlocked since
+    throttled = tuple(getattr(_errors, name) for name in ('TooManyRequests', 'RequestBlocked', 'IpBlocked')
+                      if hasattr(_errors, name))
+    return (ConnectionError, TimeoutError, requests.ConnectionError, requests.Timeout) + throttled
+
+_transcript_clients = threading.local()
+
+def get_transcript(video_id, languages):
+    """
+    Transcript segments as {'text', 'start', 'duration'} dicts, through the
+    youtube-transcript-api 1.x client (one per thread, so its HTTP session is
+    reused) or get_transcript() before 1.0.
+    """
+    from youtube_transcript_api import YouTubeTranscriptApi
+    if not hasattr(YouTubeTranscriptApi, 'fetch'):
+        return YouTubeTranscriptApi.get_transcript(video_id, languages=languages)
+    client = getattr(_transcript_clients, 'client', None)
+    if client is None:
+        client = _transcript_clients.client = YouTubeTranscriptApi()
+    return client.fetch(video_id, languages=languages).to_raw_data()
+
+def fetch_transcription_segments(video_id, retries=3, backoff=1.0, languages=('en',), cache=None):
+    """
+    Fetch a transcript, retrying network errors and throttling with
+    exponential backoff and jitter; any other error is returned at once.
+
+    With a TranscriptCache the cache is consulted first; transcripts and
+    "no transcript" answers are stored in it, other errors are not.
+    """
+    language = ','.join(languages)
+    if cache:
+        found, segments, err = cache.get(video_id, language)
+        if found:
+            return segments, err
+    from youtube_transcript_api._errors import TranscriptsDisabled, NoTranscriptFound, VideoUnavailable
+    transient = transient_transcript_errors()
+    for attempt in range(retries + 1):
+        try:
+            segments = get_transcript(video_id, languages)
+            if cache:
+                cache.put(video_id, language, segments)
+            return segments, None
+        except (TranscriptsDisabled, NoTranscriptFound) as e:
+            err = f"[{video_id}] no transcript: {e}"
+            if cache:
+                cache.put(video_id, language, error=err)
+            return None, err
+        except VideoUnavailable as e:
+            return None, f"[{video_id}] error: {e}"
+        except transient as e:
+            if attempt == retries:
+                return None, f"[{video_id}] error: {e}"
+            time.sleep(min(30.0, backoff * 2 ** attempt) * random.uniform(0.5, 1.0))
+        except Exception as e:
+            return None, f"[{video_id}] error: {e}"
 
 def format_timestamp(sec):
     m, s = divmod(int(sec), 60)
     return f"{m:02d}:{s:02d}"
 
-def highlight(text, keywords):
+class KeywordMatcher:
     """
-    Highlight each keyword with a lime background and its own color.
+    All keywords compiled into one alternation regex, built once per run.
+
+    A single scan of a text reports every keyword hit with its position. The
+    text is lowercased once and matched case-sensitively against the
+    lowercased keywords, which keeps the regex a plain literal alternation
+    (much faster in `re` than IGNORECASE or capture groups). Keywords are
+    tried longest first and the scan resumes one character after each hit,
+    so overlapping hits ("foo bar" and "bar baz" in "foo bar baz") are all
+    reported; keywords contained in a longer hit ("learn" in "learning")
+    are credited through a containment map.
     """
-    for idx, kw in enumerate(keywords):
-        color = KEY_COLORS[idx % len(KEY_COLORS)]
-        pattern = re.compile(f"(?i)({re.escape(kw)})")
-        text = pattern.sub(f"{color}{BLACK}\\1{RESET}", text)
-    return text
+    def __init__(self, keywords):
+        self.keywords = list(dict.fromkeys(kw.lower() for kw in keywords if kw))
+        self.index = {kw: i for i, kw in enumerate(self.keywords)}
+        order = sorted(self.keywords, key=len, reverse=True)
+        self.regex = re.compile('|'.join(map(re.escape, order))) if order else None
+        self.regex_ci = re.compile('|'.join(map(re.escape, order)), re.IGNORECASE) if order else None
+        self.contains = [{j for j, other in enumerate(self.keywords) if other in kw}
+                         for kw in self.keywords]
 
-def get_video_title(youtube, video_id):
-    try:
-        resp = youtube.videos().list(part="snippet", id=video_id).execute()
-        items = resp.get("items", [])
-        if items:
-            return items[0]["snippet"]["title"]
-    except:
-        pass
-    return "Unknown Title"
+    def scan(self, text):
+        """Return [(start, end, keyword_index)] for every hit, in text order"""
+        if self.regex is None:
+            return []
+        low = text.lower()
+        regex = self.regex
+        if len(low) != len(text):
+            # lowercasing changed the length (e.g. 'İ'): positions would drift
+            low, regex = text, self.regex_ci
+        hits = []
+        m = regex.search(low)
+        while m:
+            k = self.index.get(m.group().lower())
+            if k is not None:
+                hits.append((m.start(), m.end(), k))
+            m = regex.search(low, m.start() + 1)
+        return hits
+
+    def found(self, hits):
+        """Lowercased keywords occurring in a list of hits"""
+        found = set()
+        for _, _, k in hits:
+            found.update(self.contains[k])
+        return {self.keywords[k] for k in found}
+
+    def highlight(self, text, hits=None):
+        """
+        Highlight each keyword with its own background color; hits from
+        scan() can be passed in to avoid scanning the text again.
+        """
+        if hits is None:
+            hits = self.scan(text)
+        return highlight_spans(text, hits, KEY_COLORS)
+
+def highlight_spans(text, spans, colors):
+    """
+    Wrap each (start, end, color_index) span of text in its background
+    color; spans must be sorted, overlapping ones are skipped.
+    """
+    out = []
+    pos = 0
+    for start, end, k in spans:
+        if start < pos:
+            continue        # overlaps the previous highlight
+        out.append(text[pos:start])
+        out.append(f"{colors[k % len(colors)]}{BLACK}{text[start:end]}{RESET}")
+        pos = end
+    out.append(text[pos:])
+    return ''.join(out)
+
+def normalize_text(text):
+    """Collapse caption line breaks and runs of whitespace into single spaces."""
+    return ' '.join(text.split())
+
+class FlatTranscript:
+    """
+    A transcript flattened once into a single normalized text buffer, with
+    the buffer offset at which every segment starts. Offsets map back to
+    segments by bisection, and a run of segments is a plain slice of the
+    buffer, so phrases spanning two captions can be found and context
+    needs no string rebuilding.
+    """
+    def __init__(self, segments):
+        parts = [normalize_text(seg.get('text', '')) for seg in segments]
+        self.segments = segments
+        self.starts = []
+        pos = 0
+        for part in parts:
+            self.starts.append(pos)
+            pos += len(part) + 1
+        self.text = ' '.join(parts)
+        self._words = None
+
+    def segment_at(self, pos):
+        """Index of the segment containing buffer offset pos"""
+        return bisect_right(self.starts, pos) - 1
+
+    def span(self, first, last):
+        """Buffer offsets [start, end) covering segments first..last"""
+        end = self.starts[last + 1] - 1 if last + 1 < len(self.starts) else len(self.text)
+        return self.starts[first], end
+
+    def word_at(self, pos):
+        """Number of the word containing (or preceding) buffer offset pos"""
+        if self._words is None:
+            self._words = [m.start() for m in re.finditer(r'\S+', self.text)]
+        return bisect_right(self._words, pos) - 1
+
+NEAR_RE = re.compile(r'^(.+?)\s+NEAR/(\d+)\s+(.+)$')
+
+class TranscriptSearch:
+    """
+    The search terms of a run, compiled once: keywords and phrases, proximity
+    pairs ('word1 NEAR/5 word2': at most 5 words between them, either order) and
+    regular expressions.
+
+    All keywords, phrases and NEAR operands are found in one scan of a
+    FlatTranscript by a shared KeywordMatcher; each regex adds one pass.
+    Hits are reported per term as (start, end, term_index) buffer spans.
+    """
+    def __init__(self, keywords=(), regexes=()):
+        self.terms = []         # as given, for reporting
+        self.plain = []         # (term_index, normalized lowercase literal)
+        self.near = []          # (term_index, literal_a, literal_b, distance)
+        self.regexes = []       # (term_index, compiled pattern)
+        literals = []
+        for kw in keywords:
+            m = NEAR_RE.match(kw)
+            index = len(self.terms)
+            self.terms.append(kw)
+            if m:
+                a, b = normalize_text(m.group(1)).lower(), normalize_text(m.group(3)).lower()
+                self.near.append((index, a, b, int(m.group(2))))
+                literals += [a, b]
+            else:
+                literal = normalize_text(kw).lower()
+                self.plain.append((index, literal))
+                literals.append(literal)
+        for pattern in regexes:
+            self.regexes.append((len(self.terms), re.compile(pattern, re.IGNORECASE)))
+            self.terms.append(pattern)
+        self.matcher = KeywordMatcher(literals)
+        # matcher keyword -> plain terms it satisfies (itself and anything it contains)
+        self.plain_for = [[t for t, literal in self.plain if literal in kw]
+                          for kw in self.matcher.keywords]
+
+    def find(self, flat):
+        """Return the sorted (start, end, term_index) hits in a FlatTranscript"""
+        hits = []
+        keyword_hits = self.matcher.scan(flat.text)
+        for start, end, k in keyword_hits:
+            for t in self.plain_for[k]:
+                hits.append((start, end, t))
+        for t, a, b, distance in self.near:
+            hits += self._near_hits(flat, keyword_hits, t, a, b, distance)
+        for t, regex in self.regexes:
+            hits += [(m.start(), m.end(), t) for m in regex.finditer(flat.text) if m.end() > m.start()]
+        hits.sort()
+        return hits
+
+    def _near_hits(self, flat, keyword_hits, t, a, b, distance):
+        """Occurrences of a and b with at most distance words between them (as in FTS5)"""
+        def words(term):
+            return [(flat.word_at(s), flat.word_at(e - 1), s, e)
+                    for s, e, k in keyword_hits if term in self.matcher.keywords[k]]
+        side_a, side_b = words(a), words(b)
+        if not side_a or not side_b:
+            return []
+        b_firsts = [first for first, _, _, _ in side_b]
+        b_span = max(last - first for first, last, _, _ in side_b)
+        hits = set()
+        for first, last, start, end in side_a:
+            lo = bisect_left(b_firsts, first - distance - 1 - b_span)
+            hi = bisect_right(b_firsts, last + distance + 1)
+            for b_first, b_last, b_start, b_end in side_b[lo:hi]:
+                between = max(b_first - last, first - b_last, 1) - 1
+                if b_start != start and between <= distance:
+                    hits.add((start, end, t))
+                    hits.add((b_start, b_end, t))
+        return sorted(hits)
+
+def default_cache_dir():
+    """$XDG_CACHE_HOME/ytt-search, falling back to ~/.cache/ytt-search"""
+    base = os.getenv('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'ytt-search')
+
+def parse_size(val):
+    """Parse a byte size such as 500K, 200M or 1.5G into an integer."""
+    m = re.match(r'(\d+(?:\.\d+)?)\s*([kmg]?)b?$', val.strip().lower())
+    if not m:
+        raise argparse.ArgumentTypeError(f"Bad size: {val!r}")
+    return int(float(m.group(1)) * {'': 1, 'k': 1024, 'm': 1024**2, 'g': 1024**3}[m.group(2)])
+
+def parse_duration(val):
+    """Parse an age such as 90s, 30m, 12h or 7d into seconds (0 = never expires)."""
+    m = re.match(r'(\d+(?:\.\d+)?)([smhd])?$', val.strip().lower())
+    if not m:
+        raise argparse.ArgumentTypeError(f"Bad duration: {val!r}")
+    return float(m.group(1)) * {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[m.group(2) or 's']
+
+class TranscriptCache:
+    """
+    On-disk transcript cache keyed by video ID and language list.
+
+    Transcripts are stored zlib-compressed in a SQLite file. "No transcript"
+    answers are kept as negative entries that expire after negative_ttl;
+    transcripts expire after ttl (0 = never). When the stored data grows past
+    max_bytes the least recently used entries are evicted. Safe to share
+    between the fetch threads.
+    """
+    def __init__(self, directory, max_bytes=200 * 1024**2, ttl=0, negative_ttl=86400):
+        os.makedirs(directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(directory, 'transcripts.sqlite'),
+                                  check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS transcripts (
+            video_id TEXT, language TEXT, data BLOB, error TEXT,
+            fetched REAL, accessed REAL, size INTEGER,
+            PRIMARY KEY (video_id, language))""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS transcripts_lru ON transcripts (accessed)")
+        self.total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM transcripts").fetchone()[0]
+
+    def get(self, video_id, language):
+        """Return (found, segments, error); found is False on a miss or expired entry"""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT data, error, fetched FROM transcripts WHERE video_id=? AND language=?",
+                (video_id, language)).fetchone()
+            if row is None:
+                return False, None, None
+            data, error, fetched = row
+            ttl = self.negative_ttl if data is None else self.ttl
+            now = time.time()
+            if ttl and now - fetched > ttl:
+                return False, None, None
+            self.db.execute("UPDATE transcripts SET accessed=? WHERE video_id=? AND language=?",
+                            (now, video_id, language))
+            self.db.commit()
+        if data is None:
+            return True, None, error
+        return True, json.loads(zlib.decompress(data)), None
+
+    def put(self, video_id, language, segments=None, error=None):
+        """Store a transcript, or a negative entry when segments is None"""
+        data = zlib.compress(json.dumps(segments).encode()) if segments is not None else None
+        size = len(data) if data is not None else len(error or '')
+        now = time.time()
+        with self.lock:
+            old = self.db.execute("SELECT size FROM transcripts WHERE video_id=? AND language=?",
+                                  (video_id, language)).fetchone()
+            self.db.execute("INSERT OR REPLACE INTO transcripts VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            (video_id, language, data, error, now, now, size))
+            self.total += size - (old[0] if old else 0)
+            if self.total > self.max_bytes:
+                self._evict()
+            self.db.commit()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is below 90% of its limit"""
+        target = self.max_bytes * 0.9
+        rows = self.db.execute("SELECT video_id, language, size FROM transcripts ORDER BY accessed")
+        doomed = []
+        for video_id, language, size in rows:
+            if self.total <= target:
+                break
+            doomed.append((video_id, language))
+            self.total -= size
+        self.db.executemany("DELETE FROM transcripts WHERE video_id=? AND language=?", doomed)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+# one hit: start in seconds, formatted timestamp, link, snippet with the
+# surrounding segments and the indexes of the search terms found there
+Match = namedtuple('Match', 'start timestamp link snippet terms')
+
+def match_transcript(vid, segments, search, context=1, colors=KEY_COLORS, limit=None):
+    """
+    Return (matches, found) for one transcript: a Match per segment in which
+    a hit starts, and the indexes of the search terms that occurred. The
+    transcript is flattened and searched once; snippets are slices of the
+    flat buffer, highlighted from the same hits unless colors is None.
+    At most limit matches are built.
+    """
+    flat = FlatTranscript(segments)
+    hits = search.find(flat)
+    found = {t for _, _, t in hits}
+    hit_starts = [start for start, _, _ in hits]
+    # group hits by the segment they start in
+    groups = {}
+    for start, end, t in hits:
+        first = flat.segment_at(start)
+        last = flat.segment_at(max(start, end - 1))
+        group = groups.setdefault(first, [first, set()])
+        group[0] = max(group[0], last)
+        group[1].add(t)
+    matches = []
+    for first, (last, terms) in sorted(groups.items())[:limit]:
+        a = max(0, first - context)
+        b = min(len(segments) - 1, last + context)
+        s0, s1 = flat.span(a, b)
+        snippet = flat.text[s0:s1]
+        if colors:
+            lo, hi = bisect_left(hit_starts, s0), bisect_left(hit_starts, s1)
+            spans = [(start - s0, min(end, s1) - s0, t) for start, end, t in hits[lo:hi]]
+            snippet = highlight_spans(snippet, spans, colors)
+        ts = segments[first].get('start', 0)
+        link = f"https://www.youtube.com/watch?v={vid}&t={int(ts)}s"
+        matches.append(Match(ts, format_timestamp(ts), link, snippet, sorted(terms)))
+    return matches, found
+
+def scan_video(vid, search, fetch=fetch_transcription_segments, colors=KEY_COLORS, limit=None):
+    """Worker task: fetch and match one video; returns (vid, matches, found, err)"""
+    segments, err = fetch(vid)
+    if err:
+        return vid, [], set(), err
+    matches, found = match_transcript(vid, segments, search, colors=colors, limit=limit)
+    return vid, matches, found, None
+
+def scan_videos(vids, task, jobs=4, ordered=True, on_progress=None):
+    """
+    Run task(video_id) for every video on a pool of jobs threads, yielding
+    the results in input order (or as they arrive if not ordered). For a
+    keyword search task is scan_video with the TranscriptSearch bound.
+
+    on_progress(completed, total) is called after every finished video, once
+    the results it released have been consumed, so a progress bar counts
+    fetches rather than printed results.
+    """
+    total = len(vids)
+    pending = {}
+    held = {}
+    submitted = completed = emitted = 0
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        try:
+            while submitted < total or pending:
+                # a small window keeps a slow video from piling up queued work
+                while submitted < total and len(pending) < jobs * 2:
+                    future = pool.submit(task, vids[submitted])
+                    pending[future] = submitted
+                    submitted += 1
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    completed += 1
+                    if ordered:
+                        held[index] = future.result()
+                        while emitted in held:
+                            yield held.pop(emitted)
+                            emitted += 1
+                    else:
+                        yield future.result()
+                    if on_progress:
+                        on_progress(completed, total)
+        finally:
+            # stopped early (CTRL+C, consumer gone): drop the queued videos
+            for future in pending:
+                future.cancel()
+
+def print_matches(title, matches, tty=True):
+    blue, yellow, reset = (BLUE, YELLOW, RESET) if tty else ('', '', '')
+    if tty:
+        clear_line()
+    print(f"\n{blue}{title}{reset}\n")
+    for m in matches:
+        print(f"{m.link}  ({yellow}{m.timestamp}{reset})\n  …{m.snippet}…\n")
+
+def write_jsonl(out, vid, matches, search):
+    """One JSON record per hit, flushed right away so consumers can stream"""
+    for m in matches:
+        out.write(json.dumps({
+            'video_id': vid,
+            'start': m.start,
+            'timestamp': m.timestamp,
+            'link': m.link,
+            'context': m.snippet,
+            'keywords': [search.terms[t] for t in m.terms],
+        }, ensure_ascii=False) + '\n')
+    out.flush()
 
 class VersionAction(argparse.Action):
     def __init__(self, option_strings, dest=argparse.SUPPRESS, default=argparse.SUPPRESS, version="1.0.0", help="Show version and exit"):
@@ -201,25 +776,286 @@ def parse_length_expr(expr: str):
     seconds = num * {'s':1, 'm':60, 'h':3600}[unit or 's']
     return op, seconds
 
-def fetch_video_durations(youtube, vids:list[str]) -> dict[str,int]:
-    """Batch-fetch each video’s duration in seconds via contentDetails."""
-    durations = {}
-    for i in range(0, len(vids), 50):
-        batch = vids[i:i+50]
-        resp = youtube.videos().list(
-            part="contentDetails",
-            id=",".join(batch)
-        ).execute()
-        for item in resp.get("items", []):
-            vid = item["id"]
-            iso = item["contentDetails"]["duration"]
-            durations[vid] = int(isodate.parse_duration(iso).total_seconds())
-    return durations
+class MetadataCache:
+    """
+    Video metadata (see fetch_video_metadata) kept on disk next to the
+    transcript cache, and re-fetched once older than ttl seconds. Also
+    holds per-channel state (resolved handles and the uploads listing) and
+    the Data API units used per day.
+    """
+    def __init__(self, directory, ttl=7 * 86400):
+        os.makedirs(directory, exist_ok=True)
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(directory, 'metadata.sqlite'),
+                                  check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS videos (
+            video_id TEXT PRIMARY KEY, data TEXT, fetched REAL)""")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS handles (
+            name TEXT PRIMARY KEY, channel_id TEXT)""")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS uploads (
+            channel_id TEXT PRIMARY KEY, newest TEXT, video_ids TEXT,
+            next_token TEXT, synced REAL)""")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS quota (
+            day TEXT PRIMARY KEY, used INTEGER)""")
+
+    def get_many(self, vids):
+        """Return {video_id: metadata} for the fresh entries among vids"""
+        found = {}
+        cutoff = time.time() - self.ttl if self.ttl else 0
+        with self.lock:
+            for i in range(0, len(vids), 500):
+                batch = vids[i:i+500]
+                rows = self.db.execute(
+                    f"SELECT video_id, data FROM videos WHERE fetched >= ? AND video_id IN "
+                    f"({','.join('?' * len(batch))})", [cutoff] + batch)
+                found.update((vid, json.loads(data)) for vid, data in rows)
+        return found
 
-def main():
-    p = argparse.ArgumentParser(description='Search YouTube transcripts by keyword(s).')
-    p.add_argument('-V','--version', action=VersionAction, help='Show version and exit')
-    p.add_argument('-k','--keyword', required=True, help='Comma-separated keywords or a phrase')
+    def put_many(self, metadata):
+        now = time.time()
+        with self.lock:
+            self.db.executemany("INSERT OR REPLACE INTO videos VALUES (?, ?, ?)",
+                                [(vid, json.dumps(meta), now) for vid, meta in metadata.items()])
+            self.db.commit()
+
+    def get_handle(self, name):
+        with self.lock:
+            row = self.db.execute("SELECT channel_id FROM handles WHERE name = ?",
+                                  (name.lower(),)).fetchone()
+        return row[0] if row else None
+
+    def put_handle(self, name, channel_id):
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO handles VALUES (?, ?)", (name.lower(), channel_id))
+            self.db.commit()
+
+    def get_uploads(self, channel_id):
+        """
+        Return (video_ids newest first, next_token) as stored for the
+        channel, next_token being None once the listing is complete, or
+        (None, None) if it was never listed or the listing is stale.
+        """
+        cutoff = time.time() - self.ttl if self.ttl else 0
+        with self.lock:
+            row = self.db.execute(
+                "SELECT video_ids, next_token FROM uploads WHERE channel_id = ? AND synced >= ?",
+                (channel_id, cutoff)).fetchone()
+        if not row:
+            return None, None
+        return json.loads(row[0]), row[1]
+
+    def put_uploads(self, channel_id, video_ids, next_token, full=True):
+        """
+        Store a channel's listing. Only a full listing (not an update with
+        new uploads) restarts the ttl, so deleted videos drop out eventually.
+        """
+        with self.lock:
+            old = self.db.execute("SELECT synced FROM uploads WHERE channel_id = ?",
+                                  (channel_id,)).fetchone()
+            self.db.execute("INSERT OR REPLACE INTO uploads VALUES (?, ?, ?, ?, ?)",
+                            (channel_id, video_ids[0] if video_ids else None,
+                             json.dumps(video_ids), next_token,
+                             old[0] if old and not full else time.time()))
+            self.db.commit()
+
+    def get_quota(self, day):
+        with self.lock:
+            row = self.db.execute("SELECT used FROM quota WHERE day = ?", (day,)).fetchone()
+        return row[0] if row else 0
+
+    def add_quota(self, day, units):
+        with self.lock:
+            self.db.execute("""INSERT INTO quota VALUES (?, ?)
+                ON CONFLICT(day) DO UPDATE SET used = used + excluded.used""", (day, units))
+            self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+def parse_video_item(item):
+    """Metadata of one videos().list item with snippet, contentDetails and statistics parts."""
+    import isodate
+    snippet = item.get("snippet", {})
+    iso = item.get("contentDetails", {}).get("duration")
+    try:
+        duration = int(isodate.parse_duration(iso).total_seconds()) if iso else None
+    except (isodate.ISO8601Error, ValueError):
+        duration = None
+    return {
+        'title': snippet.get("title", "Unknown Title"),
+        'duration': duration,
+        'channel_id': snippet.get("channelId"),
+        'channel_title': snippet.get("channelTitle"),
+        'published': snippet.get("publishedAt"),
+        'views': int(item.get("statistics", {}).get("viewCount", 0)),
+    }
+
+def fetch_video_metadata(youtube, vids, cache=None):
+    """
+    Return {video_id: metadata} with title, duration (seconds), channel,
+    publish date and views, requesting all parts in one call for 50 IDs
+    per call. With a MetadataCache only missing or stale videos are
+    requested, and the answers are stored. Videos beyond the quota budget
+    are left out.
+    """
+    metadata = cache.get_many(vids) if cache else {}
+    # titles looked up with oEmbed lack everything else
+    metadata = {vid: meta for vid, meta in metadata.items() if meta.get('source') != 'oembed'}
+    missing = [vid for vid in vids if vid not in metadata]
+    for i in range(0, len(missing), 50):
+        batch = missing[i:i+50]
+        try:
+            resp = youtube.list("videos", part="snippet,contentDetails,statistics",
+                                id=",".join(batch))
+        except QuotaExceeded as e:
+            print(f"{e}: no titles or durations for {len(missing) - i} videos; "
+                  "run again after the quota resets.")
+            break
+        fetched = {item["id"]: parse_video_item(item) for item in resp.get("items", [])}
+        if cache:
+            cache.put_many(fetched)
+        metadata.update(fetched)
+    return metadata
+
+OEMBED_URL = "https://www.youtube.com/oembed?format=json&url="
+
+def fetch_video_title(video_id, cache=None):
+    """
+    Title of one video from the cache or YouTube's oEmbed endpoint, which
+    needs neither an API key nor quota; "Unknown Title" if both fail.
+    """
+    if cache:
+        meta = cache.get_many([video_id]).get(video_id)
+        if meta:
+            return meta['title']
+    from urllib.request import urlopen
+    url = OEMBED_URL + quote(f"https://www.youtube.com/watch?v={video_id}", safe='')
+    try:
+        with urlopen(url, timeout=10) as resp:
+            title = json.load(resp)['title']
+    except Exception:
+        return "Unknown Title"
+    if cache:
+        cache.put_many({video_id: {'title': title, 'duration': None, 'source': 'oembed'}})
+    return title
+
+def default_index_path():
+    """$XDG_DATA_HOME/ytt-search/index.sqlite, falling back to ~/.local/share"""
+    base = os.getenv('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    return os.path.join(base, 'ytt-search', 'index.sqlite')
+
+QUERY_OPERATORS = {'AND', 'OR', 'NOT', 'NEAR'}
+
+def query_terms(query):
+    """Words and quoted phrases of an FTS5 query, for highlighting."""
+    terms = []
+    negated = False
+    query = re.sub(r',\s*\d+\s*\)', ')', query)   # NEAR(... , distance)
+    for phrase, word in re.findall(r'"([^"]*)"|([^\s()"]+)', query):
+        if word in QUERY_OPERATORS or word.startswith('NEAR'):
+            negated = word == 'NOT'
+            continue
+        term = phrase if not word else word.split(':')[-1].rstrip('*').lstrip('^+-')
+        if term.strip() and not negated:
+            terms.append(term.strip())
+        negated = False
+    return terms
+
+class TranscriptIndex:
+    """
+    Persistent SQLite FTS5 index over transcript segments.
+
+    Each segment is stored with its video ID, position and start time; the
+    video's title and channel live next to it, so queries are answered
+    without any network access.
+    """
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS videos (
+                video_id TEXT PRIMARY KEY, title TEXT, channel_id TEXT,
+                language TEXT, indexed REAL, segments INTEGER);
+            CREATE TABLE IF NOT EXISTS segments (
+                id INTEGER PRIMARY KEY, video_id TEXT, seq INTEGER, start REAL, text TEXT);
+            CREATE INDEX IF NOT EXISTS segments_video ON segments (video_id, seq);
+            CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(
+                text, content='segments', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2');
+            CREATE TABLE IF NOT EXISTS channel_aliases (alias TEXT PRIMARY KEY, channel_id TEXT);
+        """)
+
+    def indexed(self):
+        """IDs of all videos already in the index"""
+        return {row[0] for row in self.db.execute("SELECT video_id FROM videos")}
+
+    def add_alias(self, alias, channel_id):
+        self.db.execute("INSERT OR REPLACE INTO channel_aliases VALUES (?, ?)", (alias, channel_id))
+        self.db.commit()
+
+    def add(self, video_id, title, segments, channel_id=None, language=None):
+        """Insert (or replace) one video's transcript"""
+        self.remove(video_id)
+        for seq, seg in enumerate(segments):
+            cur = self.db.execute(
+                "INSERT INTO segments (video_id, seq, start, text) VALUES (?, ?, ?, ?)",
+                (video_id, seq, seg.get('start', 0), seg.get('text', '')))
+            self.db.execute("INSERT INTO segments_fts (rowid, text) VALUES (?, ?)",
+                            (cur.lastrowid, seg.get('text', '')))
+        self.db.execute("INSERT INTO videos VALUES (?, ?, ?, ?, ?, ?)",
+                        (video_id, title, channel_id, language, time.time(), len(segments)))
+        self.db.commit()
+
+    def remove(self, video_id):
+        rows = self.db.execute("SELECT id, text FROM segments WHERE video_id=?", (video_id,)).fetchall()
+        self.db.executemany("INSERT INTO segments_fts (segments_fts, rowid, text) "
+                            "VALUES ('delete', ?, ?)", rows)
+        self.db.execute("DELETE FROM segments WHERE video_id=?", (video_id,))
+        self.db.execute("DELETE FROM videos WHERE video_id=?", (video_id,))
+
+    def resolve_channel(self, channel):
+        """Channel ID for a -c value used when indexing (or the value itself)"""
+        row = self.db.execute("SELECT channel_id FROM channel_aliases WHERE alias=?",
+                              (channel,)).fetchone()
+        return row[0] if row else channel
+
+    def search(self, query, channel_id=None, context=1):
+        """
+        Run an FTS5 query and return [(video_id, title, [(start, context_text), ...])]
+        with videos ordered by their best match and matches by time.
+        """
+        sql = ("SELECT s.video_id, s.seq, s.start, v.title FROM segments_fts "
+               "JOIN segments s ON s.id = segments_fts.rowid "
+               "JOIN videos v ON v.video_id = s.video_id "
+               "WHERE segments_fts MATCH ?")
+        params = [query]
+        if channel_id:
+            sql += " AND v.channel_id = ?"
+            params.append(channel_id)
+        sql += " ORDER BY rank"
+        grouped = {}
+        for video_id, seq, start, title in self.db.execute(sql, params):
+            grouped.setdefault(video_id, (title, []))[1].append((start, seq))
+        results = []
+        for video_id, (title, hits) in grouped.items():
+            matches = []
+            for start, seq in sorted(hits):
+                ctx = " ".join(text for (text,) in self.db.execute(
+                    "SELECT text FROM segments WHERE video_id=? AND seq BETWEEN ? AND ? ORDER BY seq",
+                    (video_id, seq - context, seq + context)))
+                matches.append((start, ctx))
+            results.append((video_id, title, matches))
+        return results
+
+    def close(self):
+        self.db.close()
+
+def add_source_arguments(p):
+    """Options selecting the videos to scan (shared by search and index)"""
     p.add_argument('-c','--channel', help='Channel ID, URL or handle')
     p.add_argument('-s','--sort',
                    choices=['newest','oldest','popular'],
@@ -232,26 +1068,50 @@ def main():
     p.add_argument('-f','--file', help='Path to file of YouTube URLs')
     p.add_argument('-x','--length', nargs='+', metavar='\"EXPR\"',
                    help="Filter by video duration with + or - prefixes, e.g. -x \"+5m -2h\" (seconds)")
-    args = p.parse_args()
+    p.add_argument('-j','--jobs', type=int, default=4,
+                   help='Number of transcripts fetched concurrently (default: 4)')
+    p.add_argument('--retries', type=int, default=3,
+                   help='Retries per transcript after a transient error (default: 3)')
+    p.add_argument('-l','--language', default='en',
+                   help='Comma-separated transcript languages in order of preference (default: en)')
+    p.add_argument('--cache-dir', default=default_cache_dir(),
+                   help='Transcript cache directory (default: ~/.cache/ytt-search)')
+    p.add_argument('--cache-size', type=parse_size, default='200M',
+                   help='Evict least recently used transcripts above this size (default: 200M)')
+    p.add_argument('--cache-ttl', type=parse_duration, default='0',
+                   help='Re-fetch cached transcripts older than this, e.g. 30d (default: never)')
+    p.add_argument('--negative-ttl', type=parse_duration, default='1d',
+                   help='How long "no transcript" answers are cached (default: 1d)')
+    p.add_argument('--metadata-ttl', type=parse_duration, default='7d',
+                   help='Re-fetch cached titles and durations older than this (default: 7d)')
+    p.add_argument('--no-cache', action='store_true', help='Neither read nor write the cache')
+    p.add_argument('--quota-budget', type=int,
+                   help='Data API units this tool may use per day (quotas reset at midnight '
+                        'Pacific time); work beyond it is left for the next run')
 
-    # parse keywords
-    keywords = [k.strip() for k in args.keyword.split(',') if k.strip()]
-
-    api_key = os.getenv('YOUTUBE_API_KEY')
-    if not api_key:
-        print("Error: set YOUTUBE_API_KEY in .env")
-        return
+def check_source_arguments(p, args):
+    if args.jobs < 1 or args.retries < 0:
+        p.error('--jobs must be at least 1 and --retries not negative')
 
-    yt = build('youtube','v3', developerKey=api_key)
+def collect_videos(yt, args, meta_cache=None):
+    """
+    Gather video IDs from -c/-v/-f and apply the -x length filters.
+    Returns (vids, channel_id, metadata): channel_id is None without -c and
+    metadata is only filled in (for all videos) when -x needed it. vids is
+    empty (and the reason printed) when there is nothing to process.
+    """
+    metadata = None
     vids = []
+    cid = None
 
     if args.channel:
         try:
-            cid = parse_channel_input(yt, args.channel)
+            cid = parse_channel_input(yt, args.channel, meta_cache)
             vids += get_video_ids_from_channel(
                 yt, cid,
                 sort_order=args.sort,
-                max_videos=args.maximum
+                max_videos=args.maximum,
+                state=meta_cache
             )
         except Exception as e:
             print(f"Channel fetch error: {e}")
@@ -274,7 +1134,7 @@ def main():
 
     vids = list(dict.fromkeys(vids))
     if not vids:
-        print("No videos to process."); return
+        print("No videos to process."); return [], cid, metadata
 
     # apply length filters (allow space/comma‐separated in one string or multiple args)
     if args.length:
@@ -286,12 +1146,12 @@ def main():
             exprs = [parse_length_expr(tok) for tok in raw_tokens]
         except argparse.ArgumentTypeError as e:
             print(e)
-            return
+            return [], cid, metadata
 
-        durations = fetch_video_durations(yt, vids)
+        metadata = fetch_video_metadata(yt, vids, meta_cache)
         filtered = []
         for vid in vids:
-            d = durations.get(vid)
+            d = metadata.get(vid, {}).get('duration')
             if d is None:
                 continue  # skip if we can't get duration
             ok = True
@@ -304,58 +1164,326 @@ def main():
                 filtered.append(vid)
         vids = filtered
 
-    total = len(vids)
-    if total == 0:
-        print("No videos match length filters."); return
+        if not vids:
+            print("No videos match length filters.")
+    return vids, cid, metadata
 
-    errors = []
-    found_keywords = set()
+def open_metadata_cache(args):
+    return None if args.no_cache else MetadataCache(args.cache_dir, args.metadata_ttl)
 
-    for idx, vid in enumerate(vids, start=1):
-        segments, err = fetch_transcription_segments(vid)
-        if err:
-            errors.append(err)
-        else:
-            matches = []
-            CONTEXT = 1
-            for i, seg in enumerate(segments):
-                text = seg.get('text','')
-                low_text = text.lower()
-                # record any keyword found in this segment
-                for kw in keywords:
-                    if kw.lower() in low_text:
-                        found_keywords.add(kw.lower())
-                if any(kw.lower() in low_text for kw in keywords):
-                    start_idx = max(0, i - CONTEXT)
-                    end_idx   = min(len(segments), i + CONTEXT + 1)
-                    ctx = " ".join(s.get('text','') for s in segments[start_idx:end_idx])
-                    ts = seg.get('start', 0)
-                    link = f"https://www.youtube.com/watch?v={vid}&t={int(ts)}s"
-                    tstr = format_timestamp(ts)
-                    snippet = highlight(ctx, keywords)
-                    matches.append((link, tstr, snippet))
-
-            if matches:
-                clear_line()
-                title = get_video_title(yt, vid)
-                print(f"\n{BLUE}{title}{RESET}\n")
-                for link, tstr, snippet in matches:
-                    print(f"{link}  ({YELLOW}{tstr}{RESET})\n  …{snippet}…\n")
-
-        update_progress(idx, total)
-
-    # report keywords not found
-    missing = [kw for kw in keywords if kw.lower() not in found_keywords]
-    if missing:
-        print("\nKeywords not found:")
-        for kw in missing:
-            print(f"  - {kw}")
+def open_fetcher(args):
+    """Return (fetch, cache) configured from the command line"""
+    languages = tuple(l.strip() for l in args.language.split(',') if l.strip()) or ('en',)
+    cache = None
+    if not args.no_cache:
+        cache = TranscriptCache(args.cache_dir, args.cache_size, args.cache_ttl, args.negative_ttl)
+    fetch = partial(fetch_transcription_segments, retries=args.retries,
+                    languages=languages, cache=cache)
+    return fetch, cache
+
+def needs_data_api(args):
+    """Channels and length filters need the Data API; titles alone don't."""
+    return bool(args.channel or args.length)
+
+def youtube_client(args, state=None):
+    api_key = os.getenv('YOUTUBE_API_KEY')
+    if not api_key and needs_data_api(args):
+        print("Error: set YOUTUBE_API_KEY in .env")
+        return None
+    return YouTubeAPI(api_key, args.quota_budget, state,
+                      None if args.no_cache else args.cache_dir)
+
+def report_quota(yt):
+    if yt.used or yt.budget is not None:
+        budget = f" of {yt.budget}" if yt.budget is not None else ""
+        print(f"\nData API quota: {yt.used} units used, {yt.used_today}{budget} today")
 
+def report_errors(errors):
     if errors:
         print("\nErrors:")
         for e in errors:
             print(" ", e)
 
+def search(argv):
+    p = argparse.ArgumentParser(
+        description='Search YouTube transcripts by keyword(s).',
+        epilog='Subcommands: "index" builds an offline full-text index, "query" searches it '
+               '(see "yttrsch.py index -h" / "yttrsch.py query -h").')
+    p.add_argument('-V','--version', action=VersionAction, help='Show version and exit')
+    p.add_argument('-k','--keyword',
+                   help='Comma-separated keywords or phrases; "a NEAR/5 b" finds words at most 5 apart')
+    p.add_argument('-r','--regex', action='append',
+                   help='Case-insensitive regular expression to search for; repeatable')
+    add_source_arguments(p)
+    p.add_argument('--unordered', action='store_true',
+                   help='Print results as soon as they arrive instead of in video order')
+    p.add_argument('--format', choices=['text', 'jsonl'], default='text',
+                   help='jsonl: one JSON record per hit on stdout, messages on stderr (default: text)')
+    p.add_argument('--limit', type=int, metavar='N',
+                   help='Stop fetching and matching once N hits have been output')
+    p.add_argument('--first-per-video', action='store_true',
+                   help='Only output the first hit in each video')
+    p.add_argument('--no-tty', action='store_true',
+                   help='No progress bar, line redraws or colors')
+    args = p.parse_args(argv)
+    check_source_arguments(p, args)
+    if args.limit is not None and args.limit < 1:
+        p.error('--limit must be at least 1')
+
+    # parse keywords
+    keywords = [k.strip() for k in (args.keyword or '').split(',') if k.strip()]
+    if not keywords and not args.regex:
+        p.error('give keywords with -k and/or a pattern with -r')
+    try:
+        search = TranscriptSearch(keywords, args.regex or ())
+    except re.error as e:
+        p.error(f'bad --regex: {e}')
+
+    # in jsonl mode stdout carries only the records
+    out = sys.stdout
+    with redirect_stdout(sys.stderr if args.format == 'jsonl' else out):
+        run_search(args, search, out)
+
+def run_search(args, search, out):
+    jsonl = args.format == 'jsonl'
+    tty = not (jsonl or args.no_tty)
+    meta_cache = open_metadata_cache(args)
+    yt = youtube_client(args, meta_cache)
+    if yt is None:
+        if meta_cache:
+            meta_cache.close()
+        return
+    vids, _, metadata = collect_videos(yt, args, meta_cache)
+    if not vids:
+        if meta_cache:
+            meta_cache.close()
+        report_quota(yt)
+        return
+
+    errors = []
+    found_keywords = set()
+
+    # for channel scans titles are fetched in batches of 50, kept a batch
+    # ahead of the scan; otherwise the worker that found matches in a video
+    # looks up its title. Either way printing a match never waits on a
+    # request. jsonl records carry no titles, so none are fetched.
+    oembed = not jsonl and not needs_data_api(args)
+    batched = metadata is None and not jsonl and not oembed
+    titles = {}
+    # set once --limit is reached, so queued videos aren't fetched any more
+    stop = threading.Event()
+
+    def fetch_titles(chunk):
+        if stop.is_set() or yt.exhausted:
+            return {}
+        try:
+            return fetch_video_metadata(yt, chunk, meta_cache)
+        except Exception as e:
+            errors.append(f"Could not fetch video titles: {e}")
+            return {}
+
+    prefetch = ThreadPoolExecutor(max_workers=1)
+    title_batches = {}
+
+    def prefetch_titles(completed):
+        """Submit title batches up to the one after the scan's position"""
+        while batched and len(title_batches) < min(len(vids), (completed // 50 + 2) * 50):
+            chunk = vids[len(title_batches):len(title_batches) + 50]
+            title_batches.update(dict.fromkeys(chunk, prefetch.submit(fetch_titles, chunk)))
+
+    def progress(completed, total):
+        prefetch_titles(completed)
+        if tty:
+            update_progress(completed, total)
+
+    prefetch_titles(0)
+
+    fetch, cache = open_fetcher(args)
+    per_video = 1 if args.first_per_video else args.limit
+    scan = partial(scan_video, search=search, fetch=fetch,
+                   colors=KEY_COLORS if tty else None, limit=per_video)
+
+    def task(vid):
+        if stop.is_set():
+            return vid, [], set(), None
+        result = scan(vid)
+        if oembed and result[1]:
+            titles[vid] = fetch_video_title(vid, meta_cache)
+        return result
+
+    def title(vid):
+        if oembed:
+            return titles.get(vid, "Unknown Title")
+        if metadata is not None:
+            return metadata.get(vid, {}).get('title', "Unknown Title")
+        while vid not in title_batches:
+            # unordered results can outrun the prefetch window
+            prefetch_titles(len(title_batches))
+        known = title_batches[vid].result()
+        return known.get(vid, {}).get('title', "Unknown Title")
+
+    hits = 0
+    results = scan_videos(vids, task, args.jobs, ordered=not args.unordered,
+                          on_progress=progress)
+    try:
+        for vid, matches, found, err in results:
+            if err:
+                errors.append(err)
+            found_keywords |= found
+            if not matches:
+                continue
+            if args.limit:
+                matches = matches[:args.limit - hits]
+            if jsonl:
+                write_jsonl(out, vid, matches, search)
+            else:
+                print_matches(title(vid), matches, tty)
+            hits += len(matches)
+            if args.limit and hits >= args.limit:
+                stop.set()
+                break
+    finally:
+        results.close()
+        prefetch.shutdown(cancel_futures=True)
+        if cache:
+            cache.close()
+        if meta_cache:
+            meta_cache.close()
+
+    if stop.is_set():
+        if tty:
+            clear_line()
+        print(f"\nStopped after {hits} hits (--limit).")
+    else:
+        # report keywords not found
+        missing = [term for t, term in enumerate(search.terms) if t not in found_keywords]
+        if missing:
+            print("\nKeywords not found:")
+            for kw in missing:
+                print(f"  - {kw}")
+
+    report_errors(errors)
+    report_quota(yt)
+
+def index(argv):
+    p = argparse.ArgumentParser(prog='yttrsch.py index',
+                                description='Add video transcripts to the offline full-text index.')
+    p.add_argument('--db', default=default_index_path(),
+                   help='Index database (default: ~/.local/share/ytt-search/index.sqlite)')
+    p.add_argument('--reindex', action='store_true',
+                   help='Fetch and re-index videos that are already in the index')
+    add_source_arguments(p)
+    args = p.parse_args(argv)
+    check_source_arguments(p, args)
+
+    meta_cache = open_metadata_cache(args)
+    yt = youtube_client(args, meta_cache)
+    if yt is None:
+        if meta_cache:
+            meta_cache.close()
+        return
+    vids, cid, metadata = collect_videos(yt, args, meta_cache)
+    if not vids:
+        if meta_cache:
+            meta_cache.close()
+        report_quota(yt)
+        return
+
+    db = TranscriptIndex(args.db)
+    if cid:
+        db.add_alias(args.channel, cid)
+    known = db.indexed()
+    todo = vids if args.reindex else [v for v in vids if v not in known]
+    print(f"{sum(v in known for v in vids)} of {len(vids)} videos already indexed, "
+          f"{len(todo)} to fetch")
+    if not todo:
+        db.close()
+        if meta_cache:
+            meta_cache.close()
+        report_quota(yt)
+        return
+
+    # without -c/-x titles come from oEmbed, looked up by the fetch workers
+    if metadata is None and needs_data_api(args):
+        metadata = fetch_video_metadata(yt, todo, meta_cache)
+    errors = []
+    added = 0
+    fetch, cache = open_fetcher(args)
+
+    def task(vid):
+        segments, err = fetch(vid)
+        if metadata is not None:
+            title = metadata.get(vid, {}).get('title', "Unknown Title")
+        else:
+            title = fetch_video_title(vid, meta_cache) if segments else None
+        return vid, segments, err, title
+
+    results = scan_videos(todo, task, args.jobs,
+                          ordered=False, on_progress=partial(update_progress, prefix="Indexing"))
+    try:
+        for vid, segments, err, title in results:
+            if err:
+                errors.append(err)
+                continue
+            db.add(vid, title, segments, cid, args.language)
+            added += 1
+    finally:
+        results.close()
+        if cache:
+            cache.close()
+        if meta_cache:
+            meta_cache.close()
+        db.close()
+
+    print(f"\nIndexed {added} videos into {args.db}")
+    report_errors(errors)
+    report_quota(yt)
+
+def query(argv):
+    p = argparse.ArgumentParser(
+        prog='yttrsch.py query',
+        description='Search the offline transcript index.',
+        epilog='QUERY uses SQLite FTS5 syntax: words (all must match), "exact phrases", '
+               'OR, NOT, parentheses, prefix* and NEAR(a b, 5).')
+    p.add_argument('query', nargs='+', help='Search expression')
+    p.add_argument('--db', default=default_index_path(),
+                   help='Index database (default: ~/.local/share/ytt-search/index.sqlite)')
+    p.add_argument('-c','--channel', help='Only videos indexed from this channel (as given to index)')
+    args = p.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"No index at {args.db}; build one with: yttrsch.py index -c <channel>")
+        return
+    expr = ' '.join(args.query)
+    db = TranscriptIndex(args.db)
+    try:
+        channel_id = db.resolve_channel(args.channel) if args.channel else None
+        results = db.search(expr, channel_id)
+    except sqlite3.OperationalError as e:
+        print(f"Bad query: {e}")
+        return
+    finally:
+        db.close()
+
+    matcher = KeywordMatcher(query_terms(expr))
+    for vid, title, hits in results:
+        matches = []
+        for ts, ctx in hits:
+            link = f"https://www.youtube.com/watch?v={vid}&t={int(ts)}s"
+            matches.append(Match(ts, format_timestamp(ts), link, matcher.highlight(ctx), []))
+        print_matches(title, matches)
+    if not results:
+        print("No matches.")
+
+COMMANDS = {'index': index, 'query': query}
+
+def main():
+    argv = sys.argv[1:]
+    if argv and argv[0] in COMMANDS:
+        COMMANDS[argv[0]](argv[1:])
+    else:
+        search(argv)
+
 if __name__ == "__main__":
     try:
         main()